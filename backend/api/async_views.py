@@ -0,0 +1,78 @@
+from functools import wraps
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .utils import get_current_payload, get_data_version_headers
+from recipes.utils import database_sync_to_async, get_data_version
+
+
+def render_response(response):
+    """Отрисовка ответа DRF в обычный HttpResponse.
+
+    Иначе Django отрисовывает его в единственном потоке синхронного
+    кода процесса.
+    """
+    if not hasattr(response, 'render'):
+        return response
+    response.render()
+    rendered = HttpResponse(
+        response.content, status=response.status_code
+    )
+    for header, value in response.items():
+        rendered[header] = value
+    return rendered
+
+
+def get_version_response(request, version_key):
+    """Ответ по версии справочных данных без обращения к базе.
+
+    Возвращает 304 при совпадении ETag или заранее построенный
+    список; иначе None.
+    """
+    if (
+        request.method not in ('GET', 'HEAD')
+        or 'HTTP_AUTHORIZATION' in request.META
+    ):
+        return None
+    version = get_data_version(version_key)
+    headers = get_data_version_headers(version)
+    if headers['ETag'] in parse_etags(
+        request.headers.get('If-None-Match', '')
+    ):
+        response = HttpResponseNotModified()
+    elif not request.GET:
+        payload = get_current_payload(version_key, version)
+        if payload is None:
+            return None
+        response = HttpResponse(payload, content_type='application/json')
+    else:
+        return None
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def async_read_view(view, version_key=None):
+    """Асинхронная обёртка представления для режима ASGI.
+
+    Синхронное представление вместе с отрисовкой ответа выполняется
+    в пуле потоков, не блокируя цикл событий. Для справочных данных
+    с версией version_key ответы 304 и полный список отдаются прямо
+    в цикле событий.
+    """
+    run = database_sync_to_async(
+        lambda request, *args, **kwargs: render_response(
+            view(request, *args, **kwargs)
+        )
+    )
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if version_key is not None:
+            response = get_version_response(request, version_key)
+            if response is not None:
+                return response
+        return await run(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,124 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .constants import TOKEN_CACHE_KEY, TOKEN_GENERATION_KEY
+from recipes.constants import STATE_CACHE
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш {токен: значение} со сроком жизни."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (value, time.monotonic() + self.ttl)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE['MAX_SIZE'], settings.TOKEN_CACHE['TTL']
+)
+
+
+def delete_tokens(keys):
+    """Удаление токенов из кэша процесса и общего кэша."""
+    token_cache.delete(keys)
+    if settings.TOKEN_CACHE['SHARED']:
+        caches[STATE_CACHE].delete_many(
+            [TOKEN_GENERATION_KEY.format(key) for key in keys]
+        )
+        cache.delete_many([TOKEN_CACHE_KEY.format(key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    """Сброс кэша токенов keys.
+
+    Кэш процесса очищается сразу, а общий кэш — после фиксации
+    транзакции: иначе параллельный запрос успел бы снова заполнить его
+    данными, прочитанными до фиксации.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache.delete(keys)
+    transaction.on_commit(lambda: delete_tokens(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием пользователя.
+
+    Без общего кэша пользователь хранится только в LRU-кэше процесса,
+    и в других процессах изменения и выход действуют через
+    TOKEN_CACHE['TTL'] секунд. С общим кэшем запись процесса
+    действительна, пока в общем кэше лежит то же поколение токена:
+    сброс в любом процессе удаляет поколение, и остальные процессы
+    перечитывают пользователя. Поколения хранятся в кэше состояния,
+    копии пользователей — в вытесняемом кэше по умолчанию.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE['SHARED']:
+            user = token_cache.get(key)
+            if user is None:
+                user, token = super().authenticate_credentials(key)
+                token_cache.set(key, user)
+            return copy.copy(user), key
+        user = self.get_shared_user(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            generation = uuid.uuid4().hex
+            caches[STATE_CACHE].set(
+                TOKEN_GENERATION_KEY.format(key), generation,
+                settings.TOKEN_CACHE['TTL']
+            )
+            cache.set(
+                TOKEN_CACHE_KEY.format(key), user,
+                settings.TOKEN_CACHE['TTL']
+            )
+            token_cache.set(key, (user, generation))
+        return copy.copy(user), key
+
+    def get_shared_user(self, key):
+        """Пользователь текущего поколения токена или None."""
+        generation = caches[STATE_CACHE].get(TOKEN_GENERATION_KEY.format(key))
+        if generation is None:
+            return None
+        cached = token_cache.get(key)
+        if cached is not None and cached[1] == generation:
+            return cached[0]
+        user = cache.get(TOKEN_CACHE_KEY.format(key))
+        if user is not None:
+            token_cache.set(key, (user, generation))
+        return user
@@ -0,0 +1,19 @@
+PDF_FONT_NAME = 'DejaVuSerif'
+PDF_FONT_FILE = 'DejaVuSerif.ttf'
+PDF_TITLE = 'Список покупок'
+PDF_TITLE_SIZE = 16
+PDF_LINE_SIZE = 14
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_VARIANTS = {
+    'detail': (1200, 1200),
+    'card': (480, 480),
+    'avatar': (160, 160),
+}
+RECIPE_IMAGE_VARIANTS = ('detail', 'card')
+AVATAR_IMAGE_VARIANTS = ('avatar',)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_WORKERS = 2
+TOKEN_CACHE_KEY = 'auth_token_{}'
+TOKEN_GENERATION_KEY = 'auth_token_generation_{}'
+BULK_RECIPES_MAX_COUNT = 100
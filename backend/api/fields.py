@@ -1,17 +1,56 @@
-import base64
+import binascii
+import tempfile
 
-from django.core.files.base import ContentFile
+from django.core.files import File
 from rest_framework import serializers
 
+from .constants import IMAGE_UPLOAD_MAX_SIZE
+from .images import get_variant_url
+from .utils import decode_base64
 
-class Base64ImageField(serializers.ImageField):
+
+class ImageVariantField(serializers.ImageField):
+    """Сериализатор изображения со ссылкой на уменьшенную копию.
+
+    Если копия ещё не построена, отдаётся ссылка на оригинал.
+    """
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, value):
+        url = get_variant_url(value, self.variant) if self.variant else None
+        if url is None:
+            return super().to_representation(value)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class Base64ImageField(ImageVariantField):
     """Сериализатор изображения."""
 
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_base64': 'Некорректные данные изображения.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            if len(imgstr) // 4 * 3 > IMAGE_UPLOAD_MAX_SIZE:
+                self.fail('too_large', max_size=IMAGE_UPLOAD_MAX_SIZE)
+            temp_file = tempfile.TemporaryFile()
+            try:
+                for chunk in decode_base64(imgstr):
+                    temp_file.write(chunk)
+            except binascii.Error:
+                temp_file.close()
+                self.fail('invalid_base64')
+            temp_file.seek(0)
+            data = File(temp_file, name='temp.' + ext)
 
         return super().to_internal_value(data)
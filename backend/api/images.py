@@ -0,0 +1,118 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .constants import IMAGE_VARIANT_QUALITY, IMAGE_VARIANTS, IMAGE_WORKERS
+from recipes.utils import invalidate_recipes
+
+logger = logging.getLogger(__name__)
+
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'JPEG', 'jpg'
+
+executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix='image-variants'
+)
+
+
+def get_variants_field(field_name):
+    """Имя поля модели со списком построенных копий изображения."""
+    return f'{field_name}_variants'
+
+
+def get_variant_url(field_file, variant):
+    """Ссылка на уменьшенную копию, если она уже построена.
+
+    Построенные копии берутся из поля объекта, хранилище не опрашивается.
+    """
+    if not field_file:
+        return None
+    variants = getattr(
+        field_file.instance, get_variants_field(field_file.field.name), {}
+    )
+    name = variants.get(field_file.name, {}).get(variant)
+    if name is None:
+        return None
+    return default_storage.url(name)
+
+
+def generate_variants(name, variants):
+    """Построение уменьшенных копий изображения в хранилище.
+
+    Копии сохраняются под именами по хешу содержимого, поэтому
+    перестроенная копия получает новую ссылку. Возвращает словарь
+    имён копий или None, если построить их не удалось.
+    """
+    upload_name = os.path.join(
+        os.path.dirname(name), f'variant.{VARIANT_EXTENSION}'
+    )
+    names = {}
+    try:
+        with default_storage.open(name) as image_file:
+            image = ImageOps.exif_transpose(Image.open(image_file))
+            image.load()
+        if VARIANT_FORMAT == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        for variant in variants:
+            resized = image.copy()
+            resized.thumbnail(IMAGE_VARIANTS[variant], Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(
+                buffer, VARIANT_FORMAT, quality=IMAGE_VARIANT_QUALITY
+            )
+            names[variant] = default_storage.save(
+                upload_name, ContentFile(buffer.getvalue())
+            )
+    except Exception:
+        logger.exception('Не удалось построить копии изображения %s', name)
+        return None
+    return names
+
+
+def record_variants(model, field_name, name, names):
+    """Запись построенных копий в объекты с изображением name."""
+    model.objects.filter(**{field_name: name}).update(
+        **{get_variants_field(field_name): {name: names}}
+    )
+
+
+def build_variants(model, field_name, name, variants, recipe_ids=()):
+    """Построение и запись копий изображения из поля field_name модели.
+
+    После записи сбрасываются представления рецептов recipe_ids, чтобы
+    они начали ссылаться на новые копии. Возвращает признак успешного
+    построения.
+    """
+    names = generate_variants(name, variants)
+    if names is None:
+        return False
+    record_variants(model, field_name, name, names)
+    invalidate_recipes(recipe_ids)
+    return True
+
+
+def run_build_variants(*args):
+    """Построение копий в фоновом потоке со своим соединением с базой."""
+    try:
+        build_variants(*args)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(field_file, variants, recipe_ids=()):
+    """Построение копий изображения в фоне после фиксации транзакции."""
+    if not field_file:
+        return
+    args = (
+        type(field_file.instance), field_file.field.name, field_file.name,
+        variants, list(recipe_ids)
+    )
+    transaction.on_commit(lambda: executor.submit(run_build_variants, *args))
@@ -0,0 +1,116 @@
+import http.client
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = {
+    'wsgi': ['foodgram_backend.wsgi'],
+    'asgi': [
+        'foodgram_backend.asgi', '--worker-class',
+        'uvicorn.workers.UvicornWorker'
+    ],
+}
+PATHS = tuple(quote(path, safe='/?=&') for path in (
+    '/api/recipes/', '/api/recipes/?limit=6&cursor=', '/api/recipes/1/',
+    '/api/tags/', '/api/ingredients/?search=мол', '/s/1',
+))
+
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI throughput on the hot read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 10, 50],
+            help='Количество одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Количество запросов на каждый уровень нагрузки.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов gunicorn.'
+        )
+        parser.add_argument('--port', type=int, default=8765)
+
+    def wait_for_port(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Сервер не запустился на порту {port}.')
+
+    def client(self, port, count):
+        """Последовательные запросы, каждый по новому соединению.
+
+        Синхронные процессы gunicorn не поддерживают keep-alive, поэтому
+        для равных условий соединения не переиспользуются.
+        """
+        timings = []
+        for number in range(count):
+            start = time.perf_counter()
+            connection = http.client.HTTPConnection(
+                '127.0.0.1', port, timeout=60
+            )
+            connection.request('GET', PATHS[number % len(PATHS)])
+            connection.getresponse().read()
+            connection.close()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def load(self, port, concurrency, total):
+        counts = [total // concurrency] * concurrency
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = executor.map(
+                lambda count: self.client(port, count), counts
+            )
+            timings = sorted(timing for result in results for timing in result)
+        elapsed = time.perf_counter() - start
+        return (
+            len(timings) / elapsed,
+            statistics.median(timings) * 1000,
+            timings[int(len(timings) * 0.99) - 1] * 1000,
+        )
+
+    def handle(self, *args, **options):
+        port = options['port']
+        self.stdout.write(
+            f'{"server":>6} {"clients":>8} {"req/s":>8} '
+            f'{"p50, ms":>8} {"p99, ms":>8}'
+        )
+        for name, arguments in SERVERS.items():
+            server = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn', *arguments,
+                    '--bind', f'127.0.0.1:{port}',
+                    '--workers', str(options['workers']),
+                    '--log-level', 'warning',
+                ],
+                cwd=settings.BASE_DIR,
+            )
+            try:
+                self.wait_for_port(port)
+                self.load(port, 1, len(PATHS))
+                for concurrency in options['concurrency']:
+                    rate, p50, p99 = self.load(
+                        port, concurrency, options['requests']
+                    )
+                    self.stdout.write(
+                        f'{name:>6} {concurrency:>8} {rate:>8.0f} '
+                        f'{p50:>8.1f} {p99:>8.1f}'
+                    )
+            finally:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,124 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.utils import load_backend
+from foodgram_backend.db.pool import get_pool
+
+QUERY = 'SELECT COUNT(*) FROM recipes_tag'
+
+
+def make_wrapper(alias, pooled, pool_options=None):
+    """Отдельное подключение к базе default с пулом или без него."""
+    settings_dict = dict(connections['default'].settings_dict)
+    backend = settings_dict['ENGINE'].rsplit('.', 1)[-1]
+    settings_dict['ENGINE'] = (
+        f'foodgram_backend.db.{backend}' if pooled
+        else f'django.db.backends.{backend}'
+    )
+    settings_dict['POOL'] = pool_options or {}
+    return load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+        settings_dict, alias
+    )
+
+
+def request_cycle(wrapper):
+    """Запрос так, как его выполняет обработка одного HTTP-запроса."""
+    start = time.perf_counter()
+    with wrapper.cursor() as cursor:
+        cursor.execute(QUERY)
+        cursor.fetchone()
+    wrapper.close()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Check the database connection pool and compare it with ' \
+           'plain connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Количество одновременно работающих потоков.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество запросов в каждом потоке.'
+        )
+        parser.add_argument(
+            '--pool-size', type=int, default=4,
+            help='Максимальный размер пула.'
+        )
+
+    def run_load(self, alias, pooled, options):
+        def worker(_):
+            wrapper = make_wrapper(
+                alias, pooled, {'MAX_SIZE': options['pool_size']}
+            )
+            return [
+                request_cycle(wrapper) for _ in range(options['requests'])
+            ]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            timings = [
+                timing for result in executor.map(
+                    worker, range(options['threads'])
+                ) for timing in result
+            ]
+        elapsed = time.perf_counter() - start
+        return len(timings) / elapsed, statistics.median(timings) * 1000
+
+    def check_health(self):
+        wrapper = make_wrapper(
+            'pool_health', True, {'MAX_SIZE': 1, 'CHECK_AFTER': 0}
+        )
+        request_cycle(wrapper)
+        pool = get_pool('pool_health', {})
+        pool.idle[0][0].close()
+        request_cycle(wrapper)
+        stats = pool.get_stats()
+        if stats['failed_checks'] != 1 or stats['created'] != 2:
+            raise CommandError(
+                f'Испорченное соединение не заменено: {stats}'
+            )
+
+    def check_timeout(self):
+        holder = make_wrapper(
+            'pool_timeout', True, {'MAX_SIZE': 1, 'TIMEOUT': 0.1}
+        )
+        holder.ensure_connection()
+        try:
+            make_wrapper('pool_timeout', True).ensure_connection()
+        except OperationalError:
+            pass
+        else:
+            raise CommandError('Пул выдал соединение сверх MAX_SIZE.')
+        finally:
+            holder.close()
+        stats = get_pool('pool_timeout', {}).get_stats()
+        if stats['timeouts'] != 1:
+            raise CommandError(f'Таймаут ожидания не учтён: {stats}')
+
+    def handle(self, *args, **options):
+        self.check_health()
+        self.check_timeout()
+        self.stdout.write('Проверки пула пройдены.')
+        self.stdout.write(f'{"mode":>8} {"req/s":>8} {"p50, ms":>8}')
+        for mode, pooled in (('direct', False), ('pooled', True)):
+            rate, p50 = self.run_load(f'pool_{mode}', pooled, options)
+            self.stdout.write(f'{mode:>8} {rate:>8.0f} {p50:>8.2f}')
+        stats = get_pool('pool_pooled', {}).get_stats()
+        if stats['created'] > options['pool_size']:
+            raise CommandError(f'Пул превысил MAX_SIZE: {stats}')
+        self.stdout.write(
+            'Пул: выдано {checkouts}, создано {created}, повторно '
+            '{reused}, ожиданий {waits}, среднее ожидание {average:.2f} мс, '
+            'максимальное {max_wait:.2f} мс'.format(
+                average=stats['wait_time'] * 1000 / stats['checkouts'],
+                max_wait=stats['max_wait_time'] * 1000,
+                **stats
+            )
+        )
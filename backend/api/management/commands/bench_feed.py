@@ -0,0 +1,136 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from recipes.feeds import add_feed_items, get_feed_recipe_ids
+from recipes.models import Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def naive_feed_recipe_ids(user_id, position, limit):
+    """Страница ленты соединением рецептов с подписками."""
+    recipes = Recipe.objects.filter(author__subscribers__user_id=user_id)
+    if position:
+        created_at, pk = position
+        recipes = recipes.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+    return list(
+        recipes.order_by('-created_at', '-id').values_list(
+            'id', flat=True
+        )[:limit]
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the subscription feed timeline against a plain join'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors', type=int, default=2000,
+            help='Количество авторов, на которых подписан читатель.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=5,
+            help='Количество рецептов каждого автора.'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=6,
+            help='Размер страницы ленты.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Количество повторов каждого запроса.'
+        )
+
+    def create_data(self, authors, recipes_per_author):
+        """Читатель, подписанный на авторов с рецептами.
+
+        id задаются явно, чтобы пакетная вставка работала на любой СУБД.
+        """
+        user_id = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        users = User.objects.bulk_create(
+            User(
+                id=user_id + number,
+                username=f'bench_feed_{user_id + number}',
+                email=f'bench_feed_{user_id + number}@example.com'
+            )
+            for number in range(authors + 1)
+        )
+        reader, authors = users[0], users[1:]
+        Subscription.objects.bulk_create(
+            Subscription(user=reader, blogger=author) for author in authors
+        )
+        recipe_id = (Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    id=recipe_id + number,
+                    author=authors[number % len(authors)],
+                    name=f'bench_feed_{number}',
+                    text='',
+                    cooking_time=1
+                )
+                for number in range(len(authors) * recipes_per_author)
+            ),
+            batch_size=1000
+        )
+        add_feed_items([reader.id], [
+            (recipe.id, recipe.author_id, recipe.created_at)
+            for recipe in recipes
+        ])
+        return reader.id
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000, result
+
+    def handle(self, *args, **options):
+        page_size, repeat = options['page_size'], options['repeat']
+        with transaction.atomic():
+            user_id = self.create_data(options['authors'], options['recipes'])
+            middle = naive_feed_recipe_ids(
+                user_id, None,
+                options['authors'] * options['recipes'] // 2
+            )[-1]
+            position = Recipe.objects.filter(pk=middle).values_list(
+                'created_at', 'id'
+            ).get()
+            self.stdout.write(
+                f'Подписок: {options["authors"]}, рецептов в ленте: '
+                f'{options["authors"] * options["recipes"]}'
+            )
+            self.stdout.write(
+                f'{"page":>8} {"join, ms":>10} {"timeline, ms":>13} '
+                f'{"speedup":>8}'
+            )
+            for name, page_position in (('first', None), ('middle', position)):
+                join, expected = self.measure(
+                    lambda: naive_feed_recipe_ids(
+                        user_id, page_position, page_size
+                    ),
+                    repeat
+                )
+                timeline, result = self.measure(
+                    lambda: get_feed_recipe_ids(
+                        user_id, page_position, page_size
+                    ),
+                    repeat
+                )
+                if result != expected:
+                    self.stderr.write(f'Страницы {name} не совпадают.')
+                self.stdout.write(
+                    f'{name:>8} {join:>10.2f} {timeline:>13.2f} '
+                    f'{join / timeline:>7.1f}x'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from api.constants import PDF_FONT_FILE, PDF_FONT_NAME
+from api.utils import get_pdf_font, to_pdf
+
+
+def measure(func, repeat):
+    """Среднее время (мс) и пик выделенной памяти (КиБ) вызова func."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+class Command(BaseCommand):
+    help = 'Benchmark shopping list pdf generation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+            help='Количество ингредиентов в списке покупок.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов для каждого размера.'
+        )
+
+    def handle(self, *args, **options):
+        get_pdf_font()
+        self.stdout.write(
+            f'{"items":>6} {"per-call font, ms":>18} {"cached font, ms":>16} '
+            f'{"per-call font, KiB":>19} {"cached font, KiB":>17}'
+        )
+        for size in options['sizes']:
+            shopping_cart_list = [
+                {
+                    'name': f'Ингредиент {number}',
+                    'measurement_unit': 'г',
+                    'total_amount': number,
+                }
+                for number in range(size)
+            ]
+
+            def per_call_font():
+                pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, PDF_FONT_FILE))
+                to_pdf(shopping_cart_list)
+
+            def cached_font():
+                to_pdf(shopping_cart_list)
+
+            old_time, old_peak = measure(per_call_font, options['repeat'])
+            new_time, new_peak = measure(cached_font, options['repeat'])
+            self.stdout.write(
+                f'{size:>6} {old_time:>18.2f} {new_time:>16.2f} '
+                f'{old_peak:>19.0f} {new_peak:>17.0f}'
+            )
@@ -0,0 +1,81 @@
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from api.utils import encode_to_string
+from recipes.models import Recipe
+from recipes.shortlinks import ShortLinkApplication, live_recipe_ids
+from recipes.utils import decode_to_integer
+
+
+def index_decode(string, base=settings.SHORT_URL_BASE):
+    """Прежнее декодирование через base.index и возведение в степень."""
+    integer = 0
+    for idx, char in enumerate(string):
+        power = len(string) - (idx + 1)
+        integer += base.index(char) * (len(base) ** power)
+    return integer
+
+
+def start_response(status, headers):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark short link encoding, decoding and redirects'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=100000,
+            help='Количество повторов кодирования и декодирования.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=5000,
+            help='Количество запросов редиректа.'
+        )
+
+    def measure(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 10 ** 6 / repeat
+
+    def redirects(self, application, slugs, count):
+        environs = []
+        for slug in slugs:
+            environ = {'PATH_INFO': f'/s/{slug}', 'SERVER_NAME': 'localhost'}
+            setup_testing_defaults(environ)
+            environs.append(environ)
+        start = time.perf_counter()
+        for number in range(count):
+            b''.join(application(
+                dict(environs[number % len(environs)]), start_response
+            ))
+        return count / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:100])
+        if not recipe_ids:
+            raise CommandError('Для замера нужен хотя бы один рецепт.')
+        settings.ALLOWED_HOSTS = ['localhost']
+        slugs = [encode_to_string(recipe_id) for recipe_id in recipe_ids]
+        slugs.append(encode_to_string(max(recipe_ids) + 10 ** 6))
+        repeat = options['repeat']
+        encode = self.measure(lambda: encode_to_string(123456789), repeat)
+        old_decode = self.measure(lambda: index_decode('8M0kX'), repeat)
+        new_decode = self.measure(lambda: decode_to_integer('8M0kX'), repeat)
+        self.stdout.write(
+            f'encode: {encode:.2f} us, decode: {old_decode:.2f} us -> '
+            f'{new_decode:.2f} us'
+        )
+        live_recipe_ids.refresh()
+        django_application = get_wsgi_application()
+        for title, application in (
+            ('django stack', django_application),
+            ('fast path', ShortLinkApplication(django_application)),
+        ):
+            rate = self.redirects(application, slugs, options['requests'])
+            self.stdout.write(f'{title:>12}: {rate:,.0f} редиректов/с')
@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Tag
+
+User = get_user_model()
+
+# Признаки чтения всей таблицы и явной сортировки в плане запроса.
+SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on recipes_\w+'),
+    'sqlite': re.compile(r'SCAN (TABLE )?recipes_\w+\b(?! USING)'),
+}
+SORT_PATTERNS = {
+    'postgresql': re.compile(r'\bSort\b'),
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (ORDER BY|DISTINCT)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Check that hot recipe feed queries are served by indexes'
+
+    def get_hot_queries(self):
+        """Проверяемые запросы ленты рецептов.
+
+        Для каждого запроса указаны параметры и допустима ли сортировка.
+        Избранное и список покупок выбираются по индексу пользователя,
+        но упорядочены по дате рецепта, поэтому индекс не избавляет их
+        от сортировки: она растёт с числом записей пользователя и
+        выводится как WARN.
+        """
+        queries = {
+            'feed': ({}, False),
+            'favorites': ({'is_favorited': 1}, True),
+            'shopping_cart': ({'is_in_shopping_cart': 1}, True),
+        }
+        author = User.objects.values_list('id', flat=True).first()
+        if author:
+            queries['author'] = ({'author': author}, False)
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if tags:
+            queries['tags'] = ({'tags': tags}, False)
+        return queries
+
+    def get_queryset(self, params):
+        request = APIRequestFactory().get('/api/recipes/', params)
+        force_authenticate(request, user=User(id=0))
+        view = RecipeViewSet(
+            action_map={'get': 'list'}, format_kwarg=None
+        )
+        view.request = view.initialize_request(request)
+        return view.filter_queryset(
+            view.get_queryset()
+        )[:view.paginator.page_size]
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SCAN_PATTERNS:
+            raise CommandError(
+                f'СУБД {connection.vendor} не поддерживается.'
+            )
+        failed, warned = [], []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Запрещаем последовательное чтение и сортировку, чтобы
+                # на маленьких таблицах планировщик выбирал индексы,
+                # если подходящие индексы существуют.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('SET LOCAL enable_sort = off')
+            for name, (params, allow_sort) in self.get_hot_queries().items():
+                plan = self.get_queryset(params).explain()
+                scan = SCAN_PATTERNS[connection.vendor].search(plan)
+                sort = SORT_PATTERNS[connection.vendor].search(plan)
+                if scan or sort and not allow_sort:
+                    status = 'FAIL'
+                    failed.append(name)
+                elif sort:
+                    status = 'WARN'
+                    warned.append(name)
+                else:
+                    status = 'OK'
+                self.stdout.write(f'{status} {name}: {params}')
+                if status != 'OK' or options['verbosity'] > 1:
+                    self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed)
+            )
+        if warned:
+            self.stdout.write(self.style.WARNING(
+                'Запросы с сортировкой в памяти: ' + ', '.join(warned)
+            ))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('Все планы используют индексы.')
+            )
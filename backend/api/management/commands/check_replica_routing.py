@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from foodgram_backend.db.middleware import ReplicaMiddleware
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Check that requests read from replicas and stick to the primary'
+
+    def view(self, request):
+        """Чтение, при параметре write запись и повторное чтение."""
+        tags = Tag.objects.all()
+        list(tags[:1])
+        self.reads.append(tags.db)
+        self.reads.append(Token.objects.all().db)
+        if request.GET.get('write'):
+            Tag.objects.filter(pk=0).update(name='')
+            tags = Tag.objects.all()
+            list(tags[:1])
+            self.reads.append(tags.db)
+        return HttpResponse()
+
+    def request(self, method, client, write=False, anonymous=False):
+        """Запрос клиента с токеном или анонимного клиента за прокси."""
+        self.reads = []
+        factory = RequestFactory(
+            HTTP_X_FORWARDED_FOR=client, REMOTE_ADDR='127.0.0.1'
+        ) if anonymous else RequestFactory(
+            HTTP_AUTHORIZATION=f'Token {client}'
+        )
+        request = getattr(factory, method)('/', {'write': 1} if write else {})
+        ReplicaMiddleware(self.view)(request)
+        return self.reads
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError(
+                'Реплики не настроены. Для проверки на SQLite скопируйте '
+                'db.sqlite3 и укажите копию в DB_REPLICAS.'
+            )
+        client = f'check-{id(self)}'
+        steps = (
+            ('GET читает с реплики, токен с основной базы',
+             self.request('get', client), lambda reads: (
+                 reads[0] in replicas and reads[1] == 'default'
+             )),
+            ('после записи в GET чтение с основной базы',
+             self.request('get', client, write=True),
+             lambda reads: reads[-1] == 'default'),
+            ('POST работает с основной базой',
+             self.request('post', client),
+             lambda reads: reads[0] == 'default'),
+            ('после POST клиент читает с основной базы',
+             self.request('get', client),
+             lambda reads: reads[0] == 'default'),
+            ('другой клиент читает с реплики',
+             self.request('get', f'{client}-other'),
+             lambda reads: reads[0] in replicas),
+            ('анонимный POST за прокси работает с основной базой',
+             self.request('post', f'{client}-proxy', anonymous=True),
+             lambda reads: reads[0] == 'default'),
+            ('другой анонимный клиент за прокси читает с реплики',
+             self.request('get', f'{client}-proxy-other', anonymous=True),
+             lambda reads: reads[0] in replicas),
+        )
+        failed = False
+        for title, reads, check in steps:
+            passed = check(reads)
+            failed = failed or not passed
+            self.stdout.write(
+                f'{"OK" if passed else "FAIL":>4} {title}: {", ".join(reads)}'
+            )
+        if failed:
+            raise CommandError('Маршрутизация реплик работает неверно.')
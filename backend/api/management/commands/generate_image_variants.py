@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.constants import AVATAR_IMAGE_VARIANTS, RECIPE_IMAGE_VARIANTS
+from api.images import generate_variants, get_variants_field, record_variants
+from recipes.models import Recipe
+from recipes.utils import invalidate_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Generate missing resized copies of recipe images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить копии, даже если они уже существуют.'
+        )
+
+    def process(self, model, field_name, variants, force):
+        processed = 0
+        rows = model.objects.exclude(**{field_name: ''}).values_list(
+            field_name, get_variants_field(field_name)
+        ).order_by().distinct().iterator()
+        for name, recorded in rows:
+            if not name:
+                continue
+            if not force and set(recorded.get(name, {})) >= set(variants):
+                continue
+            names = generate_variants(name, variants)
+            if names is not None:
+                record_variants(model, field_name, name, names)
+                processed += 1
+        return processed
+
+    def handle(self, *args, **options):
+        recipes = self.process(
+            Recipe, 'image', RECIPE_IMAGE_VARIANTS, options['force']
+        )
+        avatars = self.process(
+            User, 'avatar', AVATAR_IMAGE_VARIANTS, options['force']
+        )
+        if recipes or avatars:
+            invalidate_recipes(Recipe.objects.values_list('id', flat=True))
+        self.stdout.write(
+            f'Обработано изображений рецептов: {recipes}, аватаров: {avatars}'
+        )
@@ -1,8 +1,95 @@
+import base64
+import binascii
+from datetime import datetime
+
 from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitPagination(PageNumberPagination):
     """Пагинация с page и limit."""
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class LimitCursorPagination(LimitPagination):
+    """Пагинация с page и limit или по ключу (created_at, id).
+
+    С параметром cursor (пустым для первой страницы) страницы выбираются
+    по ключу последнего объекта без подсчёта общего количества и OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        queryset = queryset.order_by(*self.ordering)
+
+        def load_page(position, limit):
+            page = queryset
+            if position:
+                created_at, pk = position
+                page = page.filter(
+                    Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, pk__lt=pk)
+                )
+            return list(page[:limit])
+
+        return self.paginate_keyset(load_page, request)
+
+    def paginate_keyset(self, load_page, request):
+        """Страница по ключу из функции load_page(позиция, количество).
+
+        Позиция — пара (created_at, id) последнего объекта предыдущей
+        страницы или None для первой страницы.
+        """
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        page = load_page(
+            self.decode_cursor(cursor) if cursor else None, page_size + 1
+        )
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    def encode_cursor(self, obj):
+        position = f'{obj.created_at.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
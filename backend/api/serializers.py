@@ -1,34 +1,43 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Prefetch
+from foodgram_backend.db.routers import use_primary
 from rest_framework import serializers
 
-from .fields import Base64ImageField
+from .constants import (AVATAR_IMAGE_VARIANTS, BULK_RECIPES_MAX_COUNT,
+                        RECIPE_IMAGE_VARIANTS)
+from .fields import Base64ImageField, ImageVariantField
+from .images import get_variant_url, schedule_variants
+from .utils import get_recipes_limit, get_subscribed_ids
+from recipes.constants import RECIPE_CACHE_TIMEOUT
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
-from users.models import Subscription
+from recipes.utils import get_recipe_cache_keys, track_recipe_ingredients
 
 User = get_user_model()
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    """Сериализатор подписки."""
+class AvatarVariantsMixin:
+    """Построение уменьшенной копии аватара после его изменения."""
 
-    class Meta:
-        model = Subscription
-        fields = '__all__'
-
-    def to_representation(self, instance):
-        user = UserRecipeSerializer(
-            instance.blogger,
-            context=self.context
-        ).data
-        return user
+    def update(self, instance, validated_data):
+        changed = 'avatar' in validated_data
+        instance = super().update(instance, validated_data)
+        if changed:
+            schedule_variants(
+                instance.avatar, AVATAR_IMAGE_VARIANTS,
+                list(instance.recipes.values_list('id', flat=True))
+            )
+        return instance
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(AvatarVariantsMixin, serializers.ModelSerializer):
     """Сериализатор пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
-    avatar = Base64ImageField(required=False, allow_null=True)
+    avatar = Base64ImageField(
+        required=False, allow_null=True, variant='avatar'
+    )
 
     class Meta:
         model = User
@@ -36,16 +45,11 @@ class UserSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'avatar')
 
     def get_is_subscribed(self, obj):
-        return (
-            self.context.get('request')
-            and self.context.get('request').user.is_authenticated
-            and self.context.get('request').user.subscriptions.filter(
-                blogger=obj
-            ).exists()
-        )
+        return obj.id in get_subscribed_ids(self.context.get('request'))
 
 
-class UserAvatarSerializer(serializers.ModelSerializer):
+class UserAvatarSerializer(AvatarVariantsMixin,
+                           serializers.ModelSerializer):
     """Сериализатор аватара пользователя."""
 
     avatar = Base64ImageField(required=True, allow_null=True)
@@ -62,15 +66,27 @@ class UserAvatarSerializer(serializers.ModelSerializer):
 class RecipeDataSerializer(serializers.ModelSerializer):
     """Сериализатор основы рецепта."""
 
+    image = ImageVariantField(read_only=True, variant='card')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для пакетных изменений."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_MAX_COUNT
+    )
+
+
 class UserRecipeSerializer(UserSerializer):
     """Сериализатор информации о рецептах пользователя."""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -78,17 +94,12 @@ class UserRecipeSerializer(UserSerializer):
                   'is_subscribed', 'recipes', 'recipes_count', 'avatar')
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('request').query_params.get(
-            'recipes_limit'
-        )
+        recipes_limit = get_recipes_limit(self.context.get('request'))
         recipes = obj.recipes.all()
         if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+            recipes = recipes[:recipes_limit]
         return RecipeDataSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор тегов."""
@@ -141,6 +152,69 @@ class RecipeListSerializer(serializers.ModelSerializer):
                   'image', 'name', 'text', 'cooking_time')
 
 
+def get_recipe_representations(recipes, request, variant='detail'):
+    """Представления рецептов из общего кэша.
+
+    В кэше хранятся одинаковые для всех пользователей части представлений.
+    Отсутствующие загружаются одним набором запросов, а поля, зависящие
+    от пользователя, и абсолютные ссылки добавляются при каждом ответе.
+    Изображение отдаётся в виде копии variant, если она уже построена.
+    """
+    keys = get_recipe_cache_keys([recipe.id for recipe in recipes])
+    cached = cache.get_many(keys.values())
+    missing = [
+        recipe_id for recipe_id, key in keys.items() if key not in cached
+    ]
+    if missing:
+        with use_primary():
+            recipes_data = list(Recipe.objects.filter(
+                id__in=missing
+            ).select_related('author').prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient'
+                    )
+                ),
+            ))
+        fresh = {
+            keys[recipe.id]: {
+                'data': RecipeListSerializer(recipe).data,
+                'images': {
+                    name: get_variant_url(recipe.image, name)
+                    for name in RECIPE_IMAGE_VARIANTS
+                },
+            }
+            for recipe in recipes_data
+        }
+        cache.set_many(fresh, RECIPE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    subscribed_ids = get_subscribed_ids(request)
+    representations = []
+    for recipe in recipes:
+        fragment = cached.get(keys[recipe.id])
+        if fragment is None:
+            # Рецепт удалён после выборки списка.
+            continue
+        data = dict(fragment['data'])
+        data['image'] = fragment['images'].get(variant) or data['image']
+        data['author'] = dict(
+            data['author'],
+            is_subscribed=recipe.author_id in subscribed_ids
+        )
+        data['is_favorited'] = getattr(recipe, 'is_favorited', False)
+        data['is_in_shopping_cart'] = getattr(
+            recipe, 'is_in_shopping_cart', False
+        )
+        if request:
+            for item, field in ((data, 'image'), (data['author'], 'avatar')):
+                if item[field]:
+                    item[field] = request.build_absolute_uri(item[field])
+        representations.append(data)
+    return representations
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор рецептов."""
 
@@ -186,6 +260,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             self.get_recipe_ingredients(recipe, ingredients)
         )
         recipe.tags.set(tags)
+        schedule_variants(recipe.image, RECIPE_IMAGE_VARIANTS, [recipe.id])
         return recipe
 
     @transaction.atomic
@@ -194,11 +269,17 @@ class RecipeSerializer(serializers.ModelSerializer):
         # raise Exception(ingredients_data)
         tags_data = validated_data.pop('tags', [])
         instance.tags.set(tags_data)
-        instance.ingredients.clear()
-        RecipeIngredient.objects.bulk_create(
-            self.get_recipe_ingredients(instance, ingredients_data)
-        )
-        return super().update(instance, validated_data)
+        with track_recipe_ingredients(instance.id):
+            instance.ingredients.clear()
+            RecipeIngredient.objects.bulk_create(
+                self.get_recipe_ingredients(instance, ingredients_data)
+            )
+        instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_variants(
+                instance.image, RECIPE_IMAGE_VARIANTS, [instance.id]
+            )
+        return instance
 
     def validate(self, data):
         tags = self.initial_data.get('tags')
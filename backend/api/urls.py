@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import async_read_view
 from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from recipes.constants import INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY
 
 app_name = 'api'
 
@@ -11,6 +14,26 @@ router.register('users', UserViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
+# Маршруты, обслуживаемые асинхронно в режиме ASGI, и ключи версий
+# их справочных данных.
+ASYNC_READ_ROUTES = {
+    'recipes-list': None,
+    'recipes-detail': None,
+    'recipes-feed': None,
+    'recipes-download-shopping-cart': None,
+    'users-list': None,
+    'users-subscriptions': None,
+    'tags-list': TAGS_VERSION_KEY,
+    'ingredients-list': INGREDIENTS_VERSION_KEY,
+}
+
+if settings.ASYNC_READ_VIEWS:
+    for pattern in router.urls:
+        if pattern.name in ASYNC_READ_ROUTES:
+            pattern.callback = async_read_view(
+                pattern.callback, ASYNC_READ_ROUTES[pattern.name]
+            )
+
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken'))
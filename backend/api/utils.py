@@ -1,11 +1,30 @@
+import base64
 import io
+from functools import lru_cache
 
 from django.conf import settings
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+from foodgram_backend.db.routers import use_primary
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .constants import (BASE64_CHUNK_SIZE, PDF_FONT_FILE, PDF_FONT_NAME,
+                        PDF_LINE_SIZE, PDF_TITLE, PDF_TITLE_SIZE)
+from recipes.utils import get_data_version
+
+# Разметка страницы A4 вычисляется один раз при импорте модуля.
+PDF_WIDTH, PDF_HEIGHT = A4
+PDF_TOP, PDF_BOTTOM = PDF_HEIGHT - 2 * cm, 2 * cm
+PDF_LEFT, PDF_RIGHT = 3 * cm, PDF_WIDTH - 1 * cm
+PDF_LINE_WIDTH = PDF_RIGHT - PDF_LEFT
+PDF_TEXT_HEIGHT = PDF_TOP - PDF_BOTTOM
+PDF_TITLE_X = PDF_WIDTH // 2 - (len(PDF_TITLE) * PDF_TITLE_SIZE) // 4
 
 
 def encode_to_string(integer, base=settings.SHORT_URL_BASE):
@@ -13,47 +32,150 @@ def encode_to_string(integer, base=settings.SHORT_URL_BASE):
     if integer == 0:
         return base[0]
     length = len(base)
-    string = ''
-    while integer != 0:
-        index = integer % length
-        string = base[index] + string
-        integer //= length
-    return string
+    chars = []
+    while integer:
+        integer, index = divmod(integer, length)
+        chars.append(base[index])
+    return ''.join(reversed(chars))
+
+
+def parse_id(value):
+    """Id объекта из адреса; для нечислового значения ответ 404."""
+    if not str(value).isdigit():
+        raise NotFound
+    return int(value)
+
+
+def decode_base64(data, chunk_size=BASE64_CHUNK_SIZE):
+    """Декодирование строки base64 частями по chunk_size символов.
+
+    Пробельные символы (переносы строк) пропускаются, а остаток части,
+    не кратный четырём символам, переносится в следующую часть.
+    Некорректные данные вызывают binascii.Error.
+    """
+    rest = ''
+    for start in range(0, len(data), chunk_size):
+        chunk = rest + ''.join(data[start:start + chunk_size].split())
+        end = len(chunk) - len(chunk) % 4
+        yield base64.b64decode(chunk[:end], validate=True)
+        rest = chunk[end:]
+    if rest:
+        yield base64.b64decode(rest, validate=True)
+
+
+def get_recipes_limit(request):
+    """Параметр recipes_limit запроса; без параметра None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit() or int(recipes_limit) < 1:
+        raise ValidationError(
+            {'recipes_limit': 'Ожидается целое положительное число.'}
+        )
+    return int(recipes_limit)
+
+
+def get_subscribed_ids(request):
+    """Множество id авторов, на которых подписан текущий пользователь.
+
+    Загружается одним запросом и кэшируется на объекте запроса,
+    чтобы все сериализаторы пользователей в ответе использовали его повторно.
+    """
+    if not request or not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, '_subscribed_ids'):
+        request._subscribed_ids = frozenset(
+            request.user.subscriptions.values_list('blogger_id', flat=True)
+        )
+    return request._subscribed_ids
+
+
+def set_subscribed_ids(request, author_ids):
+    """Подстановка подписок пользователя, известных заранее.
+
+    Используется, когда все авторы в ответе заведомо входят в подписки
+    пользователя и полный список загружать не нужно.
+    """
+    request._subscribed_ids = frozenset(author_ids)
+
+
+def get_data_version_headers(version):
+    """Заголовок ETag для версии справочных данных.
+
+    Last-Modified не отдаётся: его точность в одну секунду не различает
+    несколько изменений за секунду.
+    """
+    return {'ETag': quote_etag(str(version))}
+
+
+def data_version_condition(key):
+    """Условный GET по версии справочных данных.
+
+    ETag вычисляется по версии из кэша, поэтому ответ 304 отдаётся
+    без обращения к базе данных.
+    """
+    return condition(
+        etag_func=lambda request, *args, **kwargs: str(
+            get_data_version(key)
+        )
+    )
+
+
+prebuilt_payloads = {}
+
+
+def get_prebuilt_payload(key, get_data):
+    """JSON-представление справочных данных текущей версии.
+
+    Байты ответа строятся один раз на версию данных и хранятся
+    в памяти процесса.
+    """
+    version = get_data_version(key)
+    cached_version, payload = prebuilt_payloads.get(key, (None, None))
+    if cached_version != version:
+        with use_primary():
+            payload = JSONRenderer().render(get_data())
+        prebuilt_payloads[key] = (version, payload)
+    return payload
+
+
+def get_current_payload(key, version):
+    """Построенный ранее ответ версии version или None."""
+    cached_version, payload = prebuilt_payloads.get(key, (None, None))
+    return payload if cached_version == version else None
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font():
+    """Регистрация шрифта для pdf, выполняется один раз на процесс."""
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, PDF_FONT_FILE))
+    return PDF_FONT_NAME
 
 
 def to_pdf(shopping_cart_list):
     """Создание pdf документа со списком игредиентов."""
+    font = get_pdf_font()
     buffer = io.BytesIO()
-    width, height = A4
-    u_i, d_i, l_i, r_i = height - 2 * cm, 2 * cm, 3 * cm, width - 1 * cm
-    width_center = width // 2
     pdf_file = canvas.Canvas(buffer)
     pdf_file.setEncrypt = 'utf-8'
-    pdfmetrics.registerFont(
-        TTFont('DejaVuSerif', 'DejaVuSerif.ttf', 'UTF-8')
-    )
-    title_size = 16
-    pdf_file.setFont('DejaVuSerif', title_size)
-    label = 'Список покупок'
-    pdf_file.drawString(
-        width_center - (len(label) * title_size) // 4, u_i, label
-    )
-    size = 14
-    count = title_size * 2
-    pdf_file.setFont('DejaVuSerif', size)
+    pdf_file.setFont(font, PDF_TITLE_SIZE)
+    pdf_file.drawString(PDF_TITLE_X, PDF_TOP, PDF_TITLE)
+    size = PDF_LINE_SIZE
+    count = PDF_TITLE_SIZE * 2
+    pdf_file.setFont(font, size)
     for ingredient in shopping_cart_list:
         string = (f'{ingredient["name"]} ({ingredient["measurement_unit"]}) - '
                   f'{ingredient["total_amount"]}')
-        if len(string) * size > r_i - l_i:
+        if len(string) * size > PDF_LINE_WIDTH:
             string = (f'({ingredient["total_amount"]}) '
                       f'{ingredient["measurement_unit"]} '
                       f'- {ingredient["name"]}')
         pdf_file.drawString(
-            l_i, u_i - count, string
+            PDF_LEFT, PDF_TOP - count, string
         )
-        if count + size * 2 > u_i - d_i:
+        if count + size * 2 > PDF_TEXT_HEIGHT:
             pdf_file.showPage()
-            pdf_file.setFont('DejaVuSerif', size)
+            pdf_file.setFont(font, size)
             count = 0
         else:
             count += size * 2
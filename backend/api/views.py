@@ -1,25 +1,34 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, F, OuterRef, Sum
-from django.http import FileResponse
+from django.db.models import Exists, F, OuterRef, Prefetch, Subquery
+from django.http import FileResponse, HttpResponse
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as UserViewSetBase
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPagination
+from .filters import RecipeFilter
+from .pagination import LimitCursorPagination, LimitPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (IngredientSerializer, RecipeDataSerializer,
-                          RecipeListSerializer, RecipeSerializer,
-                          SubscriptionSerializer, TagSerializer,
+                          RecipeIdsSerializer, RecipeListSerializer,
+                          RecipeSerializer, TagSerializer,
                           UserAvatarSerializer, UserRecipeSerializer,
-                          UserSerializer)
-from .utils import encode_to_string, to_pdf
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.models import Subscription
+                          UserSerializer, get_recipe_representations)
+from .utils import (data_version_condition, encode_to_string,
+                    get_prebuilt_payload, get_recipes_limit, parse_id,
+                    set_subscribed_ids, to_pdf)
+from recipes.constants import INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY
+from recipes.feeds import (add_subscription, get_feed_recipe_ids,
+                           remove_subscription)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.search import ingredient_index, search_ingredients
+from recipes.utils import (add_user_recipe, add_user_recipes,
+                           remove_user_recipe, remove_user_recipes)
 
 User = get_user_model()
 
@@ -53,16 +62,34 @@ class UserViewSet(UserViewSetBase):
         user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_bloggers_queryset(self):
+        """Авторы с предзагруженными рецептами.
+
+        При заданном recipes_limit подгружаются только последние
+        recipes_limit рецептов каждого автора одним запросом.
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return User.objects.prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('username')
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """Страница подписок текущего пользователя."""
         user = request.user
-        queryset = Subscription.objects.filter(
-            user=user
+        queryset = self.get_bloggers_queryset().filter(
+            subscribers__user=user
         )
         pages = self.paginate_queryset(queryset=queryset)
-        serializer = SubscriptionSerializer(
+        serializer = UserRecipeSerializer(
             pages,
             many=True,
             context={'request': request}
@@ -74,39 +101,34 @@ class UserViewSet(UserViewSetBase):
     def subscribe(self, request, id=None):
         """Страница добаления/удаления подписки на пользователя."""
         user = request.user
-        blogger = self.get_object()
-        if request.method == 'POST':
-            if user == blogger:
-                return Response(
-                    {'blogger': 'Попытка подписки на себя отклонена.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            subscription, created = Subscription.objects.get_or_create(
-                user=user,
-                blogger=blogger
+        blogger_id = parse_id(id)
+        if blogger_id == user.id:
+            return Response(
+                {'blogger': 'Попытка подписки на себя отклонена.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            if not created:
-                return Response(
-                    {'subscription': 'Пользователь уже был подписан.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        bloggers = self.get_bloggers_queryset()
+        if not add_subscription(user.id, blogger_id):
+            if not User.objects.filter(pk=blogger_id).exists():
+                raise NotFound
             return Response(
-                UserRecipeSerializer(
-                    self.get_object(),
-                    context={'request': request}
-                ).data,
-                status=status.HTTP_201_CREATED
+                {'subscription': 'Пользователь уже был подписан.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        return Response(
+            UserRecipeSerializer(
+                bloggers.get(pk=blogger_id),
+                context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
+        )
 
     @subscribe.mapping.delete
     def delete_subscription(self, request, id=None):
-        user = request.user
-        blogger = self.get_object()
-        del_amount, del_dict = Subscription.objects.filter(
-            user=user,
-            blogger=blogger
-        ).delete()
-        if not del_amount:
+        blogger_id = parse_id(id)
+        if not remove_subscription(request.user.id, blogger_id):
+            if not User.objects.filter(pk=blogger_id).exists():
+                raise NotFound
             return Response(
                 {'subscription': 'Данной подписки не существует.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -121,6 +143,19 @@ class TagViewSet(viewsets.ModelViewSet):
     pagination_class = None
     http_method_names = ('get')
 
+    @method_decorator(data_version_condition(TAGS_VERSION_KEY))
+    def list(self, request):
+        """Список тегов из заранее построенного ответа."""
+        return HttpResponse(
+            get_prebuilt_payload(
+                TAGS_VERSION_KEY,
+                lambda: self.get_serializer(
+                    self.get_queryset(), many=True
+                ).data
+            ),
+            content_type='application/json'
+        )
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     """Класс-вьюсет ингредиетнов."""
@@ -128,15 +163,42 @@ class IngredientViewSet(viewsets.ModelViewSet):
     serializer_class = IngredientSerializer
     pagination_class = None
     http_method_names = ('get')
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+
+    @method_decorator(data_version_condition(INGREDIENTS_VERSION_KEY))
+    def list(self, request):
+        """Поиск ингредиентов по началу названия через индекс в памяти.
+
+        С параметром search выполняется поиск по началу названия,
+        подстроке и триграммному сходству. Полный список отдаётся
+        из заранее построенного ответа.
+        """
+        if not request.query_params:
+            return HttpResponse(
+                get_prebuilt_payload(
+                    INGREDIENTS_VERSION_KEY,
+                    lambda: self.get_serializer(
+                        ingredient_index.search(), many=True
+                    ).data
+                ),
+                content_type='application/json'
+            )
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else None
+        search = request.query_params.get('search')
+        if search:
+            ingredients = search_ingredients(search, limit)
+        else:
+            ingredients = ingredient_index.search(
+                request.query_params.get('name', ''), limit
+            )
+        return Response(self.get_serializer(ingredients, many=True).data)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Класс-вьюсет рецептов."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = LimitPagination
+    pagination_class = LimitCursorPagination
     permission_classes = (IsAuthorOrReadOnly,)
     http_method_names = ('get', 'post', 'patch', 'delete')
     filter_backends = (DjangoFilterBackend,)
@@ -165,6 +227,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         return queryset
 
+    def list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            get_recipe_representations(page, request, variant='card')
+        )
+
+    def retrieve(self, request, pk=None):
+        representations = get_recipe_representations(
+            [self.get_object()], request
+        )
+        if not representations:
+            raise NotFound
+        return Response(representations[0])
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь.
+
+        Страницы выбираются только по ключу (created_at, id).
+        """
+        queryset = self.get_queryset()
+
+        def load_page(position, limit):
+            recipe_ids = get_feed_recipe_ids(request.user.id, position, limit)
+            recipes = queryset.in_bulk(recipe_ids)
+            return [
+                recipes[recipe_id]
+                for recipe_id in recipe_ids if recipe_id in recipes
+            ]
+
+        page = self.paginator.paginate_keyset(load_page, request)
+        # Все авторы ленты — подписки пользователя, полный список
+        # подписок для признака is_subscribed не загружается.
+        set_subscribed_ids(request, (recipe.author_id for recipe in page))
+        return self.get_paginated_response(
+            get_recipe_representations(page, request, variant='card')
+        )
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
         """Страница получения короткой ссылки на рецепт."""
@@ -180,13 +282,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         """Страница скачивания списка покупок."""
         shopping_cart_list = list(
-            RecipeIngredient.objects.filter(
-                recipe__shopping_cart__user=request.user
+            ShoppingListItem.objects.filter(
+                user=request.user
             ).values(
                 name=F('ingredient__name'),
-                measurement_unit=F('ingredient__measurement_unit')
-            ).annotate(
-                total_amount=Sum('amount')
+                measurement_unit=F('ingredient__measurement_unit'),
+                total_amount=F('amount')
             ).order_by('ingredient__name')
         )
         buffer = to_pdf(shopping_cart_list)
@@ -194,13 +295,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
                             filename="Список покупок.pdf")
 
     def create_user_recipe(self, model):
-        user = self.request.user
-        recipe = self.get_object()
-        instance, created = model.objects.get_or_create(
-            user=user,
-            recipe=recipe
-        )
-        if not created:
+        recipe_id = parse_id(self.kwargs['pk'])
+        added = add_user_recipe(model, self.request.user, recipe_id)
+        recipe = Recipe.objects.filter(pk=recipe_id).only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time'
+        ).first()
+        if recipe is None:
+            raise NotFound
+        if not added:
             return Response(
                 {'adding erorr': 'Уже добавлено.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -211,19 +313,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     def delete_user_recipe(self, model):
-        user = self.request.user
-        recipe = self.get_object()
-        del_amount, del_dict = model.objects.get(
-            user=user,
-            recipe=recipe
-        ).delete()
-        if not del_amount:
+        recipe_id = parse_id(self.kwargs['pk'])
+        if not remove_user_recipe(model, self.request.user, recipe_id):
+            if not Recipe.objects.filter(pk=recipe_id).exists():
+                raise NotFound
             return Response(
                 {'deletion error': 'Данной связи не существует.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def change_user_recipes(self, model, add):
+        """Пакетное добавление или удаление рецептов с итогом по каждому."""
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        found = set(
+            Recipe.objects.filter(
+                id__in=recipe_ids
+            ).values_list('id', flat=True)
+        )
+        if add:
+            changed = add_user_recipes(model, self.request.user, found)
+            outcomes = ('added', 'exists')
+        else:
+            changed = remove_user_recipes(model, self.request.user, found)
+            outcomes = ('removed', 'absent')
+        return Response({
+            'results': [
+                {
+                    'id': recipe_id,
+                    'status': (
+                        'not_found' if recipe_id not in found
+                        else outcomes[recipe_id not in changed]
+                    )
+                }
+                for recipe_id in recipe_ids
+            ]
+        })
+
+    @action(detail=False, methods=['post'], url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        """Пакетное добавление рецептов в список покупок."""
+        return self.change_user_recipes(ShoppingCart, add=True)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_delete_shopping_cart(self, request):
+        """Пакетное удаление рецептов из списка покупок."""
+        return self.change_user_recipes(ShoppingCart, add=False)
+
+    @action(detail=False, methods=['post'], url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def bulk_favorite(self, request):
+        """Пакетное добавление рецептов в избранное."""
+        return self.change_user_recipes(Favorite, add=True)
+
+    @bulk_favorite.mapping.delete
+    def bulk_delete_favorite(self, request):
+        """Пакетное удаление рецептов из избранного."""
+        return self.change_user_recipes(Favorite, add=False)
+
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
@@ -0,0 +1,75 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .routers import use_replicas
+from recipes.constants import STATE_CACHE
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'db_primary_sticky_{}'
+WRITE_SQL = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+def get_client(request):
+    """Клиент запроса: токен, сессия или адрес.
+
+    За прокси адресом служит последний адрес X-Forwarded-For, который
+    добавил сам прокси, иначе у всех анонимных клиентов был бы адрес
+    прокси и общая метка.
+    """
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return request.META['HTTP_AUTHORIZATION']
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        return session
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_sticky_key(request):
+    return STICKY_KEY.format(
+        hashlib.sha1(get_client(request).encode()).hexdigest()
+    )
+
+
+def switch_to_primary(execute, sql, params, many, context):
+    """Переключение остатка запроса на основную базу после записи."""
+    if WRITE_SQL.match(sql):
+        use_replicas.set(False)
+    return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    """Выбор базы для чтения на время запроса.
+
+    Безопасные запросы читают с реплик, пока в них не выполнена запись.
+    После небезопасного запроса клиент REPLICA_STICKY_SECONDS секунд
+    читает с основной базы, чтобы увидеть собственные изменения даже
+    при отставании реплик. Метка хранится в кэше состояния, поэтому
+    действует во всех процессах и не вытесняется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        token = use_replicas.set(
+            safe and not caches[STATE_CACHE].get(get_sticky_key(request))
+        )
+        try:
+            with connections['default'].execute_wrapper(switch_to_primary):
+                response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        if not safe:
+            caches[STATE_CACHE].set(
+                get_sticky_key(request), True,
+                settings.REPLICA_STICKY_SECONDS
+            )
+        return response
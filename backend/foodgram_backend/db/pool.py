@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Пул соединений с базой данных одного процесса.
+
+    Ограничивает число одновременно выданных соединений, проверяет
+    простаивавшие соединения при выдаче и собирает статистику ожидания.
+    """
+
+    def __init__(self, max_size, timeout, check_after):
+        self.timeout = timeout
+        self.check_after = check_after
+        self.idle = deque()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.stats = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'failed_checks': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+        }
+
+    def record_wait(self, wait_time):
+        with self.lock:
+            self.stats['checkouts'] += 1
+            self.stats['wait_time'] += wait_time
+            self.stats['max_wait_time'] = max(
+                self.stats['max_wait_time'], wait_time
+            )
+            if wait_time > 0.001:
+                self.stats['waits'] += 1
+
+    def checkout(self, connect, check):
+        """Выдача соединения из пула или нового соединения."""
+        start = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.stats['timeouts'] += 1
+            raise OperationalError(
+                f'Нет свободных соединений в пуле за {self.timeout} с.'
+            )
+        self.record_wait(time.monotonic() - start)
+        try:
+            while True:
+                with self.lock:
+                    connection, returned_at = (
+                        self.idle.pop() if self.idle else (None, None)
+                    )
+                if connection is None:
+                    connection = connect()
+                    with self.lock:
+                        self.stats['created'] += 1
+                    return connection
+                if (
+                    time.monotonic() - returned_at < self.check_after
+                    or check(connection)
+                ):
+                    with self.lock:
+                        self.stats['reused'] += 1
+                    return connection
+                with self.lock:
+                    self.stats['failed_checks'] += 1
+                self.discard(connection)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def checkin(self, connection, reusable=True):
+        """Возврат соединения в пул."""
+        if reusable:
+            with self.lock:
+                self.idle.append((connection, time.monotonic()))
+        else:
+            self.discard(connection)
+        self.slots.release()
+
+    def discard(self, connection):
+        with self.lock:
+            self.stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            logger.debug('Не удалось закрыть соединение.', exc_info=True)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, idle=len(self.idle))
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """Пул соединений псевдонима базы для текущего процесса."""
+    key = (alias, os.getpid())
+    if key not in pools:
+        with pools_lock:
+            if key not in pools:
+                pools[key] = ConnectionPool(
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5),
+                    check_after=options.get('CHECK_AFTER', 30),
+                )
+    return pools[key]
+
+
+def check_connection(connection):
+    """Проверка соединения простым запросом."""
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+class PooledDatabaseWrapperMixin:
+    """Выдача соединений из пула вместо открытия новых.
+
+    Закрытие соединения Django возвращает его в пул после отката
+    незавершённой транзакции. Параметры пула задаются ключом POOL
+    в настройках базы: MAX_SIZE, TIMEOUT и CHECK_AFTER (через сколько
+    секунд простоя соединение проверяется перед выдачей).
+    """
+
+    def get_pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().checkout(
+            partial(super().get_new_connection, conn_params),
+            check_connection
+        )
+
+    def _close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.rollback()
+        except Exception:
+            reusable = False
+        else:
+            reusable = True
+        self.get_pool().checkin(self.connection, reusable)
@@ -0,0 +1,55 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Разрешено ли читать с реплик в текущем запросе.
+use_replicas = ContextVar('use_replicas', default=False)
+
+# Модели, которые всегда читаются с основной базы: токен или сессия,
+# созданные только что, могут ещё не дойти до реплики, а кэш в базе
+# хранит версии данных и метки чтения с основной базы.
+PRIMARY_MODELS = {
+    'authtoken.token', 'sessions.session', 'django_cache.cacheentry'
+}
+
+
+@contextmanager
+def use_primary():
+    """Чтение с основной базы внутри блока.
+
+    Для данных, которые попадают в долгоживущие кэши: отстающая реплика
+    закрепила бы в них устаревшие данные под новой версией.
+    """
+    token = use_replicas.set(False)
+    try:
+        yield
+    finally:
+        use_replicas.reset(token)
+
+
+class ReplicaRouter:
+    """Маршрутизатор чтения на реплики.
+
+    Чтение уходит на случайную реплику, только если middleware разрешил
+    это для запроса.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not use_replicas.get()
+            or f'{model._meta.app_label}.{model._meta.model_name}'
+            in PRIMARY_MODELS
+        ):
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -81,6 +82,78 @@ else:
         }
     }
 
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('CONN_MAX_AGE', 0))
+
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['ENGINE'] = 'foodgram_backend.db.{}'.format(
+        DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+    )
+    DATABASES['default']['POOL'] = {
+        'MAX_SIZE': DB_POOL_MAX_SIZE,
+        'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        'CHECK_AFTER': float(os.getenv('DB_POOL_CHECK_AFTER', 30)),
+    }
+
+# Реплики для чтения: хосты PostgreSQL или файлы SQLite через пробел.
+DATABASE_REPLICAS = []
+
+for number, location in enumerate(os.getenv('DB_REPLICAS', '').split(), 1):
+    DATABASES[f'replica_{number}'] = dict(
+        DATABASES['default'],
+        **{'NAME' if SQLITE3 else 'HOST': location},
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram_backend.db.routers.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'foodgram_backend.db.middleware.ReplicaMiddleware')
+
+
+def get_cache_options(backend, max_entries):
+    """Предел записей кэша; клиенты Memcached его не принимают."""
+    if 'memcached' in backend:
+        return {}
+    return {'MAX_ENTRIES': max_entries}
+
+
+# Оба кэша должны быть общими для всех процессов, см. проверку
+# recipes.E001. В default лежат вытесняемые копии представлений,
+# в state — версии данных, поколения токенов и метки чтения с основной
+# базы, которые вытесняться не должны.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND',
+    'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+    else 'django.core.cache.backends.filebased.FileBasedCache'
+)
+STATE_CACHE_BACKEND = os.getenv(
+    'STATE_CACHE_BACKEND',
+    'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+    else 'django.core.cache.backends.db.DatabaseCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', '' if DEBUG else '/tmp/foodgram_cache'
+        ),
+        'OPTIONS': get_cache_options(
+            CACHE_BACKEND, int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+        ),
+    },
+    'state': {
+        'BACKEND': STATE_CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'STATE_CACHE_LOCATION', 'state' if DEBUG else 'cache_state'
+        ),
+        'OPTIONS': get_cache_options(STATE_CACHE_BACKEND, 10 ** 7),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,6 +185,7 @@ STATIC_ROOT = '/static/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media/'
+DEFAULT_FILE_STORAGE = 'api.storage.ContentHashStorage'
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -135,7 +209,7 @@ DJOSER = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -144,3 +218,14 @@ REST_FRAMEWORK = {
 }
 
 PAGE_SIZE = 6
+
+# SHARED обязателен при нескольких процессах: иначе выход и смена
+# пароля доходят до других процессов только через TTL секунд.
+TOKEN_CACHE = {
+    'MAX_SIZE': int(os.getenv('TOKEN_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.getenv('TOKEN_CACHE_TTL', 60)),
+    'SHARED': os.getenv('TOKEN_CACHE_SHARED', str(not DEBUG)) == 'True',
+}
+
+# Включается в foodgram_backend/asgi.py.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
@@ -1,8 +1,8 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .utils import track_recipe_ingredients
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -20,6 +20,22 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         'amount',
     )
 
+    def save_model(self, request, obj, form, change):
+        with track_recipe_ingredients(
+            obj.recipe_id, form.initial.get('recipe')
+        ):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with track_recipe_ingredients(
+            *queryset.values_list('recipe_id', flat=True).distinct()
+        ):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -58,27 +74,20 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
-        'favorites_count'
+        'favorites_count',
+        'in_carts_count',
     )
     readonly_fields = ('author',)
 
-    def get_queryset(self, request):
-        return super(RecipeAdmin, self).get_queryset(request).annotate(
-            favorites_count=Count('favorites', distinct=True)
-        )
-
-    @admin.display(
-        ordering='favorites_count',
-        description='Общее число добавлений в избранное'
-    )
-    def favorites_count(self, obj):
-        return obj.favorites_count
-
     def get_readonly_fields(self, request, obj=None):
         if request.user.is_superuser:
             return []
         return self.readonly_fields
 
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients(form.instance.id):
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
@@ -98,3 +107,14 @@ class TagAdmin(admin.ModelAdmin):
         'name',
         'slug',
     )
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Админка для агрегированных списков покупок."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
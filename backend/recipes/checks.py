@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .constants import STATE_CACHE
+from .utils import is_cache_local
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Без DEBUG кэши должны быть общими для процессов.
+
+    Через кэш состояния процессы узнают о смене версий справочных
+    данных, иначе загрузка ингредиентов или рецептов командой не
+    доходит до запущенных процессов, а ETag ответов расходятся.
+    Копии представлений в кэше по умолчанию сбрасываются в одном
+    процессе и должны исчезать во всех.
+    """
+    if settings.DEBUG:
+        return []
+    return [
+        Error(
+            f'Локальный кэш {alias} не разделяется между процессами.',
+            hint=f'Задайте {setting} общего кэша: Memcached, файловый '
+            'или в базе данных.',
+            id='recipes.E001',
+        )
+        for alias, setting in (
+            ('default', 'CACHE_BACKEND'),
+            (STATE_CACHE, 'STATE_CACHE_BACKEND'),
+        )
+        if is_cache_local(alias)
+    ]
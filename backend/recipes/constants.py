@@ -7,3 +7,19 @@ INGREDIENT_AMOUNT_MAX_VALUE = 32767
 RECIPE_NAME_MAX_LENGTH = 256
 RECIPE_COOKING_TIME_MIN_VALUE = 1
 RECIPE_COOKING_TIME_MAX_VALUE = 32767
+INGREDIENTS_VERSION_KEY = 'ingredients_version'
+TAGS_VERSION_KEY = 'tags_version'
+RECIPES_VERSION_KEY = 'recipes_version'
+SHORT_LINK_PREFIX = '/s/'
+SHORT_LINK_MAX_LENGTH = 11
+INGREDIENT_SIMILARITY_THRESHOLD = 0.3
+RECIPE_CACHE_KEY = 'recipe_representation_v3_{}_{}'
+RECIPE_VERSION_KEY = 'recipe_version_{}'
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+POPULAR_AUTHORS_VERSION_KEY = 'popular_authors_version'
+STATE_CACHE = 'state'
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
@@ -0,0 +1,227 @@
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import Count, Q
+from foodgram_backend.db.routers import use_primary
+
+from .constants import FEED_FANOUT_MAX_SUBSCRIBERS, POPULAR_AUTHORS_VERSION_KEY
+from .models import FeedItem, Recipe
+from .utils import (bump_data_version, can_return_rows, change_counters,
+                    delete_returning_related_ids, get_data_version,
+                    insert_ignoring_conflicts)
+from users.models import Subscription
+
+User = get_user_model()
+
+popular_authors_cache = {}
+
+# Рецепты рассылаются пакетно через fan_out_recipes, обработчик
+# сохранения отдельного рецепта ничего не рассылает.
+fan_out_muted = ContextVar('fan_out_muted', default=False)
+
+
+def get_popular_author_ids():
+    """Множество id авторов, рецепты которых не рассылаются по лентам.
+
+    У таких авторов больше FEED_FANOUT_MAX_SUBSCRIBERS подписчиков, их
+    рецепты добавляются в ленту при чтении. Множество хранится в памяти
+    процесса и перестраивается при смене версии.
+    """
+    version = get_data_version(POPULAR_AUTHORS_VERSION_KEY)
+    if popular_authors_cache.get('version') != version:
+        with use_primary():
+            author_ids = frozenset(
+                Subscription.objects.values('blogger_id').annotate(
+                    subscribers=Count('id')
+                ).filter(
+                    subscribers__gt=FEED_FANOUT_MAX_SUBSCRIBERS
+                ).values_list('blogger_id', flat=True).order_by()
+            )
+        popular_authors_cache.update(author_ids=author_ids, version=version)
+    return popular_authors_cache['author_ids']
+
+
+def add_feed_items(user_ids, recipes):
+    """Добавление рецептов (id, автор, дата) в ленты пользователей."""
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                created_at=created_at
+            )
+            for user_id in user_ids
+            for recipe_id, author_id, created_at in recipes
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def get_author_recipes(author_id):
+    return list(
+        Recipe.objects.filter(author_id=author_id).values_list(
+            'id', 'author_id', 'created_at'
+        ).order_by()
+    )
+
+
+def fan_out_recipe(recipe):
+    """Рассылка нового рецепта по лентам подписчиков автора.
+
+    Рецепты популярных авторов не рассылаются.
+    """
+    subscriber_ids = list(
+        Subscription.objects.filter(
+            blogger_id=recipe.author_id
+        ).values_list('user_id', flat=True)[:FEED_FANOUT_MAX_SUBSCRIBERS + 1]
+    )
+    if len(subscriber_ids) > FEED_FANOUT_MAX_SUBSCRIBERS:
+        return
+    add_feed_items(
+        subscriber_ids, [(recipe.id, recipe.author_id, recipe.created_at)]
+    )
+
+
+def fan_out_recipes(recipes):
+    """Рассылка рецептов (id, автор, дата) по лентам подписчиков.
+
+    Подписчики всех авторов выбираются одним запросом, рецепты
+    популярных авторов не рассылаются.
+    """
+    author_recipes = {}
+    for recipe in recipes:
+        author_recipes.setdefault(recipe[1], []).append(recipe)
+    subscribers = {}
+    for user_id, author_id in Subscription.objects.filter(
+        blogger_id__in=author_recipes
+    ).exclude(
+        blogger_id__in=get_popular_author_ids()
+    ).values_list('user_id', 'blogger_id').order_by().iterator():
+        subscribers.setdefault(author_id, []).append(user_id)
+    for author_id, user_ids in subscribers.items():
+        add_feed_items(user_ids, author_recipes[author_id])
+
+
+def follow_author(user_id, author_id):
+    """Заполнение ленты после подписки на автора.
+
+    Рецепты непопулярного автора копируются в ленту подписчика. Если
+    подписка сделала автора популярным, множество популярных авторов
+    перестраивается.
+    """
+    subscribers = Subscription.objects.filter(blogger_id=author_id).count()
+    if subscribers > FEED_FANOUT_MAX_SUBSCRIBERS:
+        if subscribers == FEED_FANOUT_MAX_SUBSCRIBERS + 1:
+            bump_data_version(POPULAR_AUTHORS_VERSION_KEY)
+        return
+    add_feed_items([user_id], get_author_recipes(author_id))
+
+
+def unfollow_author(user_id, author_id):
+    """Очистка ленты после отписки от автора.
+
+    Если автор перестал быть популярным, его рецепты рассылаются
+    оставшимся подписчикам.
+    """
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+    subscriber_ids = list(
+        Subscription.objects.filter(
+            blogger_id=author_id
+        ).values_list('user_id', flat=True)[:FEED_FANOUT_MAX_SUBSCRIBERS + 1]
+    )
+    if len(subscriber_ids) == FEED_FANOUT_MAX_SUBSCRIBERS:
+        add_feed_items(subscriber_ids, get_author_recipes(author_id))
+        bump_data_version(POPULAR_AUTHORS_VERSION_KEY)
+
+
+def apply_subscription_change(user_id, author_id, delta):
+    """Счётчик подписчиков и лента после изменения подписки.
+
+    delta равна 1 после подписки и -1 после отписки. Вызывается и
+    обработчиками сигналов, и операциями, которые пишут в базу без
+    сигналов.
+    """
+    change_counters(User, 'subscribers_count', {author_id: delta})
+    if delta > 0:
+        follow_author(user_id, author_id)
+    else:
+        unfollow_author(user_id, author_id)
+
+
+def add_subscription(user_id, author_id):
+    """Подписка на автора.
+
+    Возвращает True, если автор существует и подписки не было.
+    """
+    with transaction.atomic():
+        added = insert_ignoring_conflicts(
+            Subscription, 'blogger', author_id, user=user_id
+        )
+        if added:
+            apply_subscription_change(user_id, author_id, 1)
+    return added
+
+
+def remove_subscription(user_id, author_id):
+    """Отписка от автора.
+
+    Без RETURNING подписка удаляется через ORM, и изменения вносят
+    обработчики сигналов. Возвращает True, если подписка была.
+    """
+    with transaction.atomic():
+        if not can_return_rows(
+            connections[router.db_for_write(Subscription)]
+        ):
+            deleted, _ = Subscription.objects.filter(
+                user_id=user_id, blogger_id=author_id
+            ).delete()
+            return bool(deleted)
+        removed = delete_returning_related_ids(
+            Subscription, 'blogger', [author_id], user=user_id
+        )
+        if removed:
+            apply_subscription_change(user_id, author_id, -1)
+    return bool(removed)
+
+
+def before_position(position, id_field):
+    """Условие выборки записей после позиции (created_at, id)."""
+    created_at, pk = position
+    return Q(created_at__lt=created_at) | Q(
+        created_at=created_at, **{f'{id_field}__lt': pk}
+    )
+
+
+def get_feed_recipe_ids(user_id, position, limit):
+    """id рецептов ленты по убыванию (created_at, id) после position.
+
+    Страница собирается из ленты пользователя и рецептов популярных
+    авторов, на которых он подписан.
+    """
+    items = FeedItem.objects.filter(user_id=user_id)
+    if position:
+        items = items.filter(before_position(position, 'recipe_id'))
+    page = list(
+        items.order_by('-created_at', '-recipe_id').values_list(
+            'created_at', 'recipe_id'
+        )[:limit]
+    )
+    popular_ids = get_popular_author_ids()
+    if popular_ids:
+        recipes = Recipe.objects.filter(
+            author_id__in=popular_ids, author__subscribers__user_id=user_id
+        )
+        if position:
+            recipes = recipes.filter(before_position(position, 'id'))
+        page = sorted(
+            set(page) | set(
+                recipes.order_by('-created_at', '-id').values_list(
+                    'created_at', 'id'
+                )[:limit]
+            ),
+            reverse=True
+        )[:limit]
+    return [recipe_id for _, recipe_id in page]
@@ -0,0 +1,75 @@
+import csv
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.search import IngredientIndex
+
+QUERIES = ('а', 'мол', 'молок', 'сгущ', 'масло', 'перец черн', 'малако')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ingredient search over the ingredients catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.BASE_DIR.parent / 'data'
+            / 'ingredients.csv',
+            help='CSV файл каталога ингредиентов.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1000,
+            help='Количество повторов каждого запроса.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Максимальное количество результатов.'
+        )
+
+    def measure(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) * 10 ** 6 / repeat, len(result)
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as f:
+            ingredients = [
+                {'id': number, 'name': name, 'measurement_unit': unit}
+                for number, (name, unit) in enumerate(csv.reader(f), 1)
+            ]
+        index = IngredientIndex()
+        start = time.perf_counter()
+        index.build(ingredients)
+        self.stdout.write(
+            f'Ингредиентов: {len(ingredients)}, построение индекса: '
+            f'{(time.perf_counter() - start) * 1000:.1f} мс'
+        )
+        index.refresh = lambda: None
+        repeat, limit = options['repeat'], options['limit']
+        self.stdout.write(
+            f'{"query":>12} {"scan prefix, us":>16} {"index prefix, us":>17} '
+            f'{"scan substring, us":>19} {"index search, us":>17} '
+            f'{"found":>6}'
+        )
+        for query in QUERIES:
+            folded = query.casefold()
+            scan_prefix, _ = self.measure(lambda: [
+                ingredient for ingredient in ingredients
+                if ingredient['name'].casefold().startswith(folded)
+            ][:limit], repeat)
+            index_prefix, _ = self.measure(
+                lambda: index.search(query, limit), repeat
+            )
+            scan_substring, _ = self.measure(lambda: [
+                ingredient for ingredient in ingredients
+                if folded in ingredient['name'].casefold()
+            ][:limit], repeat)
+            index_search, found = self.measure(
+                lambda: index.search_fuzzy(query, limit), repeat
+            )
+            self.stdout.write(
+                f'{query:>12} {scan_prefix:>16.1f} {index_prefix:>17.1f} '
+                f'{scan_substring:>19.1f} {index_search:>17.1f} {found:>6}'
+            )
@@ -0,0 +1,113 @@
+import base64
+import json
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes with ingredients and tags to NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию стандартный вывод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов, читаемых из базы за раз.'
+        )
+        parser.add_argument(
+            '--embed-images', action='store_true',
+            help='Включить содержимое изображений в base64.'
+        )
+
+    def get_batches(self, batch_size):
+        """Пакеты рецептов по возрастанию id с составом и тегами."""
+        last_id = 0
+        while True:
+            recipes = list(
+                Recipe.objects.filter(id__gt=last_id).select_related(
+                    'author'
+                ).only(
+                    'id', 'name', 'text', 'image', 'cooking_time',
+                    'created_at', 'author__email'
+                ).order_by('id')[:batch_size]
+            )
+            if not recipes:
+                return
+            last_id = recipes[-1].id
+            ids = [recipe.id for recipe in recipes]
+            tags = {recipe_id: [] for recipe_id in ids}
+            for recipe_id, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids
+            ).values_list('recipe_id', 'tag__slug').order_by('tag__slug'):
+                tags[recipe_id].append(slug)
+            ingredients = {recipe_id: [] for recipe_id in ids}
+            for recipe_id, name, unit, amount in (
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=ids
+                ).values_list(
+                    'recipe_id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount'
+                ).order_by('recipe_id', 'ingredient__name')
+            ):
+                ingredients[recipe_id].append({
+                    'name': name, 'measurement_unit': unit, 'amount': amount
+                })
+            yield recipes, tags, ingredients
+
+    def get_image_data(self, name):
+        """Содержимое изображения в base64 или None, если файла нет."""
+        try:
+            with default_storage.open(name) as image_file:
+                return base64.b64encode(image_file.read()).decode()
+        except OSError:
+            self.stderr.write(f'Изображение {name} не найдено.')
+            return None
+
+    def handle(self, *args, **options):
+        path = options['path']
+        output = (
+            self.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8')
+        )
+        # При выгрузке в стандартный вывод ход работы пишется в stderr.
+        progress = self.stderr if path == '-' else self.stdout
+        exported = 0
+        start = time.perf_counter()
+        try:
+            for recipes, tags, ingredients in self.get_batches(
+                options['batch_size']
+            ):
+                for recipe in recipes:
+                    record = {
+                        'id': recipe.id,
+                        'author': recipe.author.email,
+                        'name': recipe.name,
+                        'text': recipe.text,
+                        'cooking_time': recipe.cooking_time,
+                        'created_at': recipe.created_at.isoformat(),
+                        'image': recipe.image.name,
+                        'tags': tags[recipe.id],
+                        'ingredients': ingredients[recipe.id],
+                    }
+                    if options['embed_images'] and recipe.image:
+                        record['image_data'] = self.get_image_data(
+                            recipe.image.name
+                        )
+                    output.write(
+                        json.dumps(record, ensure_ascii=False) + '\n'
+                    )
+                exported += len(recipes)
+                elapsed = time.perf_counter() - start
+                progress.write(
+                    f'Выгружено рецептов: {exported}, '
+                    f'{exported / elapsed:.0f} в секунду.'
+                )
+        finally:
+            if output is not self.stdout:
+                output.close()
@@ -0,0 +1,288 @@
+import base64
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.constants import (INGREDIENT_AMOUNT_MAX_VALUE,
+                               INGREDIENT_AMOUNT_MIN_VALUE,
+                               RECIPE_COOKING_TIME_MAX_VALUE,
+                               RECIPE_COOKING_TIME_MIN_VALUE,
+                               RECIPES_VERSION_KEY)
+from recipes.feeds import fan_out_muted, fan_out_recipes
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.utils import bump_data_version, change_counters, is_cache_local
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes from NDJSON produced by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для загрузки, по умолчанию стандартный ввод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Размер пакета bulk_create.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Количество рецептов в одной транзакции.'
+        )
+        parser.add_argument(
+            '--keep-ids', action='store_true',
+            help='Сохранить id рецептов, чтобы не менялись короткие ссылки. '
+            'Рецепты с уже занятыми id пропускаются.'
+        )
+
+    def load_maps(self):
+        """Словари для разрешения ссылок на авторов, теги и ингредиенты."""
+        self.authors = dict(User.objects.values_list('email', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        }
+
+    def check_range(self, value, min_value, max_value, field):
+        if not isinstance(value, int) or not (
+            min_value <= value <= max_value
+        ):
+            raise ValueError(f'недопустимое значение {field}: {value!r}')
+        return value
+
+    def save_image(self, name, data):
+        """Сохранение изображения из файла выгрузки.
+
+        Возвращает имя файла в хранилище и признак того, что файл создан
+        этой загрузкой: такой файл удаляется, если рецепт не сохранён.
+        """
+        content = ContentFile(data)
+        created = not default_storage.exists(
+            default_storage.get_hashed_name(name, content)
+        )
+        return default_storage.save(name, content), created
+
+    def delete_images(self, chunk, kept=()):
+        """Удаление созданных загрузкой изображений рецептов пакета.
+
+        Файлы, на которые ссылаются рецепты kept, не удаляются.
+        """
+        names = {
+            recipe.image.name for recipe, *_, created_image in chunk
+            if created_image
+        } - {recipe.image.name for recipe, *_ in kept}
+        for name in names:
+            default_storage.delete(name)
+
+    def parse_record(self, record):
+        """Рецепт, id тегов, состав и признак нового изображения.
+
+        Состав — словарь {id ингредиента: количество}. Изображение
+        из image_data сохраняется только после проверки всей строки.
+        """
+        try:
+            author_id = self.authors[record['author']]
+        except KeyError:
+            raise ValueError(f'автор {record["author"]!r} не найден')
+        tag_ids = set()
+        for slug in record['tags']:
+            if slug not in self.tags:
+                raise ValueError(f'тег {slug!r} не найден')
+            tag_ids.add(self.tags[slug])
+        amounts = {}
+        for item in record['ingredients']:
+            key = (item['name'], item['measurement_unit'])
+            if key not in self.ingredients:
+                raise ValueError(f'ингредиент {key!r} не найден')
+            if self.ingredients[key] in amounts:
+                raise ValueError(f'ингредиент {key!r} повторяется')
+            amounts[self.ingredients[key]] = self.check_range(
+                item['amount'], INGREDIENT_AMOUNT_MIN_VALUE,
+                INGREDIENT_AMOUNT_MAX_VALUE, 'amount'
+            )
+        if not amounts:
+            raise ValueError('нет ингредиентов')
+        created_at = record.get('created_at')
+        if created_at is not None:
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError('недопустимое значение created_at')
+        image = record.get('image') or None
+        image_data = None
+        if record.get('image_data'):
+            image_data = base64.b64decode(record['image_data'], validate=True)
+        recipe = Recipe(
+            author_id=author_id,
+            name=record['name'],
+            text=record['text'],
+            image=image,
+            cooking_time=self.check_range(
+                record['cooking_time'], RECIPE_COOKING_TIME_MIN_VALUE,
+                RECIPE_COOKING_TIME_MAX_VALUE, 'cooking_time'
+            ),
+        )
+        if self.keep_ids:
+            recipe.id = record['id']
+        created_image = False
+        if image_data is not None:
+            recipe.image, created_image = self.save_image(
+                image or 'recipes/images/image', image_data
+            )
+        return recipe, created_at, tag_ids, amounts, created_image
+
+    def read_records(self, lines):
+        """Разобранные записи файла, ошибочные строки пропускаются."""
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield self.parse_record(json.loads(line))
+            except (ValueError, KeyError, TypeError) as error:
+                self.skipped += 1
+                self.stderr.write(f'Строка {number} пропущена: {error}')
+
+    def create_recipes(self, recipes):
+        """Создание рецептов с получением их id.
+
+        Если СУБД не возвращает id из пакетной вставки, а id не заданы
+        в файле, рецепты сохраняются по одному без рассылки по лентам.
+        При пакетной вставке сигналы не отправляются, и счётчики
+        рецептов авторов изменяются здесь же.
+        """
+        connection = connections[router.db_for_write(Recipe)]
+        if (self.keep_ids
+                or connection.features.can_return_rows_from_bulk_insert):
+            Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+            change_counters(
+                User, 'recipes_count',
+                Counter(recipe.author_id for recipe in recipes)
+            )
+        else:
+            token = fan_out_muted.set(True)
+            try:
+                for recipe in recipes:
+                    recipe.save()
+            finally:
+                fan_out_muted.reset(token)
+
+    def reset_sequence(self):
+        """Сдвиг последовательности id после вставки явных значений."""
+        connection = connections[router.db_for_write(Recipe)]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Recipe]):
+                cursor.execute(sql)
+
+    def import_chunk(self, chunk):
+        if self.keep_ids:
+            existing = set(Recipe.objects.filter(
+                id__in=[recipe.id for recipe, *_ in chunk]
+            ).values_list('id', flat=True).order_by())
+            self.skipped += sum(
+                recipe.id in existing for recipe, *_ in chunk
+            )
+            skipped = [item for item in chunk if item[0].id in existing]
+            chunk = [item for item in chunk if item[0].id not in existing]
+            self.delete_images(skipped, kept=chunk)
+        if not chunk:
+            return
+        try:
+            self.save_chunk(chunk)
+        except Exception:
+            self.delete_images(chunk)
+            raise
+        self.imported += len(chunk)
+
+    def save_chunk(self, chunk):
+        recipes = [recipe for recipe, *_ in chunk]
+        with transaction.atomic():
+            self.create_recipes(recipes)
+            # auto_now_add заменяет дату при вставке, исходная дата
+            # восстанавливается отдельным пакетным UPDATE.
+            dated = []
+            for recipe, created_at, *_ in chunk:
+                if created_at is not None:
+                    recipe.created_at = created_at
+                    dated.append(recipe)
+            Recipe.objects.bulk_update(
+                dated, ['created_at'], batch_size=self.batch_size
+            )
+            # Ленты подписчиков пополняются уже с исходными датами.
+            fan_out_recipes(
+                (recipe.id, recipe.author_id, recipe.created_at)
+                for recipe in recipes
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                    for recipe, _, tag_ids, *_ in chunk for tag_id in tag_ids
+                ),
+                batch_size=self.batch_size
+            )
+            RecipeIngredient.objects.bulk_create(
+                (
+                    RecipeIngredient(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for recipe, _, _, amounts, _ in chunk
+                    for ingredient_id, amount in amounts.items()
+                ),
+                batch_size=self.batch_size
+            )
+            transaction.on_commit(
+                lambda: bump_data_version(RECIPES_VERSION_KEY)
+            )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Размеры пакета и транзакции должны быть > 0.')
+        if is_cache_local():
+            self.stderr.write(self.style.WARNING(
+                'Кэш локальный: запущенные процессы не увидят новые данные '
+                'до перезапуска.'
+            ))
+        self.batch_size = options['batch_size']
+        self.keep_ids = options['keep_ids']
+        self.imported = self.skipped = 0
+        self.load_maps()
+        path = options['path']
+        lines = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        start = time.perf_counter()
+        try:
+            records = self.read_records(lines)
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'Загружено рецептов: {self.imported}, пропущено: '
+                    f'{self.skipped}, {self.imported / elapsed:.0f} '
+                    'в секунду.'
+                )
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+        if self.keep_ids:
+            self.reset_sequence()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена за {time.perf_counter() - start:.1f} с: '
+            f'рецептов {self.imported}, пропущено {self.skipped}.'
+        ))
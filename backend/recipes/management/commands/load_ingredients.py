@@ -1,24 +1,263 @@
+import csv
+import io
 import json
 import os
+import time
+from collections import defaultdict
+from itertools import islice
 
-from django.core.management.base import BaseCommand
-from foodgram_backend import settings
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
 
-from recipes.models import Ingredient
+from recipes.constants import (INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH,
+                               INGREDIENT_NAME_MAX_LENGTH,
+                               INGREDIENTS_VERSION_KEY)
+from recipes.models import Ingredient, RecipeIngredient
+from recipes.utils import bump_data_version, invalidate_recipes, is_cache_local
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson',
+           '.jsonl': 'ndjson'}
+
+STAGING_TABLE = 'ingredient_staging'
+UNIQUE_CONSTRAINT = 'unique_name_measurement_unit'
 
 
 class Command(BaseCommand):
-    help = 'Load ingredients to database'
+    help = 'Load or update ingredients from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.json'),
+            help='Файл со списком ингредиентов.'
+        )
+        parser.add_argument(
+            '--format', choices=sorted(set(FORMATS.values())),
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество строк, записываемых за раз.'
+        )
+        parser.add_argument(
+            '--update-units', action='store_true',
+            help='Заменять единицу измерения у ингредиента, если в базе '
+            'и в пакете у названия ровно по одной единице.'
+        )
+
+    def iter_json_array(self, file, chunk_size=2 ** 16):
+        """Элементы массива JSON без чтения файла целиком."""
+        decoder = json.JSONDecoder()
+        buffer, state = '', 'start'
+        while True:
+            buffer = buffer.lstrip()
+            if not buffer:
+                buffer = file.read(chunk_size)
+                if not buffer:
+                    raise CommandError('Неожиданный конец файла JSON.')
+            elif state == 'start':
+                if buffer[0] != '[':
+                    raise CommandError('Ожидается массив JSON.')
+                buffer, state = buffer[1:], 'value'
+            elif buffer[0] == ']':
+                return
+            elif state == 'separator':
+                if buffer[0] != ',':
+                    raise CommandError('Ошибка в файле JSON.')
+                buffer, state = buffer[1:], 'value'
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    chunk = file.read(chunk_size)
+                    if not chunk:
+                        raise CommandError('Ошибка в файле JSON.')
+                    buffer += chunk
+                    continue
+                yield item
+                buffer, state = buffer[end:], 'separator'
+
+    def read_items(self, file, file_format):
+        """Пары (название, единица измерения) в исходном виде."""
+        if file_format == 'csv':
+            yield from csv.reader(file)
+        elif file_format == 'ndjson':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from self.iter_json_array(file)
+
+    def clean_rows(self, items):
+        """Проверенные пары, ошибочные строки пропускаются."""
+        for number, item in enumerate(items, 1):
+            if isinstance(item, dict):
+                item = (item.get('name'), item.get('measurement_unit'))
+            try:
+                name, unit = (value.strip() for value in item)
+            except (AttributeError, TypeError, ValueError):
+                name = unit = ''
+            if (not name or not unit
+                    or len(name) > INGREDIENT_NAME_MAX_LENGTH
+                    or len(unit) > INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH):
+                self.skipped += 1
+                self.stderr.write(f'Запись {number} пропущена: {item!r}')
+                continue
+            yield name, unit
+
+    def get_unit_changes(self, rows, existing):
+        """Изменения единиц измерения {id: (название, новая единица)}.
+
+        Единица заменяется, только если у названия ровно одна единица
+        и в пакете, и в базе.
+        """
+        file_units = defaultdict(set)
+        for name, unit in rows:
+            file_units[name].add(unit)
+        db_units = defaultdict(list)
+        for ingredient_id, name, unit in existing:
+            db_units[name].append((ingredient_id, unit))
+        changes = {}
+        for name, units in file_units.items():
+            if len(units) == 1 and len(db_units.get(name, ())) == 1:
+                (ingredient_id, unit), = db_units[name]
+                new_unit, = units
+                if unit != new_unit:
+                    changes[ingredient_id] = (name, new_unit)
+        return changes
+
+    def load_batch(self, rows):
+        """Загрузка пакета средствами ORM на любой СУБД.
+
+        Возвращает количество добавленных и id обновлённых ингредиентов.
+        """
+        unique_rows = list(dict.fromkeys(rows))
+        existing = list(Ingredient.objects.filter(
+            name__in={name for name, _ in unique_rows}
+        ).values_list('id', 'name', 'measurement_unit').order_by())
+        changes = (
+            self.get_unit_changes(unique_rows, existing)
+            if self.update_units else {}
+        )
+        Ingredient.objects.bulk_update(
+            [
+                Ingredient(id=ingredient_id, measurement_unit=unit)
+                for ingredient_id, (_, unit) in changes.items()
+            ],
+            ['measurement_unit']
+        )
+        known = {(name, unit) for _, name, unit in existing}
+        known.update(changes.values())
+        new = [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in unique_rows if (name, unit) not in known
+        ]
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new), list(changes)
+
+    def load_batch_postgresql(self, rows, connection):
+        """Загрузка пакета через COPY во временную таблицу и слияние."""
+        quote = connection.ops.quote_name
+        table = quote(Ingredient._meta.db_table)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} '
+                f'(name varchar({INGREDIENT_NAME_MAX_LENGTH}), '
+                'measurement_unit '
+                f'varchar({INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH}))'
+            )
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            updated_ids = []
+            if self.update_units:
+                cursor.execute(
+                    f'UPDATE {table} AS ingredient '
+                    'SET measurement_unit = staging.measurement_unit '
+                    'FROM (SELECT name, MIN(measurement_unit) '
+                    f'AS measurement_unit FROM {STAGING_TABLE} '
+                    'GROUP BY name '
+                    'HAVING COUNT(DISTINCT measurement_unit) = 1) AS staging '
+                    'WHERE ingredient.name = staging.name '
+                    'AND ingredient.measurement_unit '
+                    '<> staging.measurement_unit '
+                    f'AND NOT EXISTS (SELECT 1 FROM {table} AS other '
+                    'WHERE other.name = ingredient.name '
+                    'AND other.id <> ingredient.id) '
+                    'RETURNING ingredient.id'
+                )
+                updated_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+                f'ON CONFLICT ON CONSTRAINT {UNIQUE_CONSTRAINT} DO NOTHING'
+            )
+            return cursor.rowcount, updated_ids
 
-    def handle(self, *args, **kwargs):
-        file_name = 'ingredients.json'
-        json_file = os.path.join(settings.BASE_DIR, file_name)
+    def handle(self, *args, **options):
+        if is_cache_local():
+            self.stderr.write(self.style.WARNING(
+                'Кэш локальный: запущенные процессы не увидят новые данные '
+                'до перезапуска.'
+            ))
+        path = options['path']
+        file_format = options['format'] or FORMATS.get(
+            os.path.splitext(path)[1].lower()
+        )
+        if file_format is None:
+            raise CommandError(
+                f'Не удалось определить формат файла {path}, '
+                'укажите --format.'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть больше нуля.')
+        self.update_units = options['update_units']
+        self.skipped = 0
+        inserted = updated = total = 0
+        connection = connections[router.db_for_write(Ingredient)]
+        start = time.perf_counter()
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data_list = json.load(f)
-                obj_list = [Ingredient(**data_dict) for data_dict in data_list]
-                Ingredient.objects.bulk_create(obj_list, ignore_conflicts=True)
-        except FileNotFoundError:
-            print(f'Файл {file_name} со списком ингредиентов не найден.')
-        except Exception as e:
-            print(f'Ошибка при загрузке ингредиентов: {e}')
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = self.clean_rows(self.read_items(file, file_format))
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    with transaction.atomic(using=connection.alias):
+                        if connection.vendor == 'postgresql':
+                            batch_inserted, updated_ids = (
+                                self.load_batch_postgresql(batch, connection)
+                            )
+                        else:
+                            batch_inserted, updated_ids = self.load_batch(
+                                batch
+                            )
+                        invalidate_recipes(
+                            RecipeIngredient.objects.filter(
+                                ingredient_id__in=updated_ids
+                            ).values_list('recipe_id', flat=True).distinct()
+                        )
+                    total += len(batch)
+                    inserted += batch_inserted
+                    updated += len(updated_ids)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл {path}: {error}')
+        except (json.JSONDecodeError, csv.Error) as error:
+            raise CommandError(f'Ошибка в файле {path}: {error}')
+        finally:
+            if inserted or updated:
+                bump_data_version(INGREDIENTS_VERSION_KEY)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, обновлено: {updated}, пропущено: '
+            f'{self.skipped + total - inserted - updated} '
+            f'за {elapsed:.2f} с '
+            f'({(total + self.skipped) / elapsed:.0f} строк в секунду).'
+        ))
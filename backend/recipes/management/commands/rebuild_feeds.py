@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feeds import (add_feed_items, get_author_recipes,
+                           get_popular_author_ids)
+from recipes.models import FeedItem
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = 'Rebuild subscription feed timelines from subscriptions'
+
+    def handle(self, *args, **options):
+        popular_ids = get_popular_author_ids()
+        subscribers = {}
+        for user_id, author_id in Subscription.objects.exclude(
+            blogger_id__in=popular_ids
+        ).values_list('user_id', 'blogger_id').order_by().iterator():
+            subscribers.setdefault(author_id, []).append(user_id)
+        with transaction.atomic():
+            FeedItem.objects.all().delete()
+            for author_id, user_ids in subscribers.items():
+                add_feed_items(user_ids, get_author_recipes(author_id))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты перестроены: авторов {len(subscribers)}, '
+            f'записей {FeedItem.objects.count()}.'
+        ))
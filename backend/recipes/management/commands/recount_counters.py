@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.utils import change_counters
+from users.models import Subscription
+
+User = get_user_model()
+
+# Модель и её счётчик, модель подсчитываемых записей и поле ссылки.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe_id'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe_id'),
+    (User, 'recipes_count', Recipe, 'author_id'),
+    (User, 'subscribers_count', Subscription, 'blogger_id'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Recount stored recipe and user counters and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только сообщить о расхождениях, не исправляя счётчики.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов, пересчитываемых в одной транзакции.'
+        )
+
+    def recount_batch(self, model, field, related, column, last_id, options):
+        """Пересчёт счётчиков пакета объектов с id больше last_id.
+
+        Строки пакета блокируются до подсчёта, поэтому одновременные
+        изменения счётчиков дожидаются конца транзакции и не теряются.
+        Возвращает id последнего объекта и расхождения {id: изменение}.
+        """
+        with transaction.atomic():
+            stored = dict(
+                model.objects.select_for_update().filter(
+                    pk__gt=last_id
+                ).order_by('pk').values_list(
+                    'pk', field
+                )[:options['batch_size']]
+            )
+            if not stored:
+                return None, {}
+            actual = dict(
+                related.objects.filter(
+                    **{f'{column}__in': stored}
+                ).values(column).annotate(
+                    total=Count('pk')
+                ).values_list(column, 'total').order_by()
+            )
+            drift = {
+                pk: actual.get(pk, 0) - count
+                for pk, count in stored.items()
+                if actual.get(pk, 0) != count
+            }
+            if not options['dry_run']:
+                change_counters(model, field, drift)
+        return max(stored), drift
+
+    def handle(self, *args, **options):
+        for model, field, related, column in COUNTERS:
+            name = f'{model._meta.model_name}.{field}'
+            total, last_id = 0, 0
+            while last_id is not None:
+                last_id, drift = self.recount_batch(
+                    model, field, related, column, last_id, options
+                )
+                total += len(drift)
+                for pk, delta in drift.items():
+                    self.stdout.write(f'{name} id={pk}: {delta:+d}')
+            self.stdout.write(f'{name}: расхождений {total}.')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:30
+
+from django.db import migrations
+from django.db.models import Count
+
+from recipes.constants import FEED_FANOUT_MAX_SUBSCRIBERS
+
+BATCH_SIZE = 1000
+
+
+def fill_feed_items(apps, schema_editor):
+    """Заполнение лент по подпискам, оформленным до появления лент.
+
+    Как и при подписке, в ленты копируются только рецепты авторов,
+    у которых не больше FEED_FANOUT_MAX_SUBSCRIBERS подписчиков.
+    """
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    author_ids = list(
+        Subscription.objects.values('blogger_id').annotate(
+            subscribers=Count('id')
+        ).filter(
+            subscribers__lte=FEED_FANOUT_MAX_SUBSCRIBERS
+        ).values_list('blogger_id', flat=True).order_by()
+    )
+    for author_id in author_ids:
+        recipes = list(
+            Recipe.objects.filter(author_id=author_id).values_list(
+                'id', 'created_at'
+            ).order_by()
+        )
+        if not recipes:
+            continue
+        subscriber_ids = list(
+            Subscription.objects.filter(blogger_id=author_id).values_list(
+                'user_id', flat=True
+            )
+        )
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    created_at=created_at
+                )
+                for user_id in subscriber_ids
+                for recipe_id, created_at in recipes
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_variants'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_items, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,7 @@ from .constants import (INGREDIENT_AMOUNT_MAX_VALUE,
                         RECIPE_COOKING_TIME_MAX_VALUE,
                         RECIPE_COOKING_TIME_MIN_VALUE, RECIPE_NAME_MAX_LENGTH,
                         TAG_NAME_MAX_LENGTH, TAG_SLUG_MAX_LENGTH)
+from users.models import CountersMixin
 
 User = get_user_model()
 
@@ -64,7 +65,7 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Класс модели рецепт."""
     author = models.ForeignKey(
         User,
@@ -88,6 +89,11 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         default=None
     )
+    image_variants = models.JSONField(
+        verbose_name='Построенные копии изображения',
+        default=dict,
+        editable=False
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[
@@ -96,13 +102,33 @@ class Recipe(models.Model):
         ]
     )
     text = models.TextField(verbose_name='Описание')
-    created_at = models.DateTimeField(
-        'Дата добавления', auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField('Дата добавления', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Общее число добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Общее число добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    COUNTER_FIELDS = ('favorites_count', 'in_carts_count')
+    VARIANTS_FIELDS = ('image_variants',)
 
     class Meta:
         verbose_name = 'объект "Рецепт"'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-created_at', 'name', 'author', 'cooking_time', 'text')
+        ordering = ('-created_at', '-id')
+        indexes = (
+            models.Index(
+                fields=('-created_at', '-id'), name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-created_at', '-id'),
+                name='recipe_author_created_at_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -186,3 +212,85 @@ class ShoppingCart(RecipeUser):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Класс модели позиции агрегированного списка покупок.
+
+    Хранит суммарное количество ингредиента по всем рецептам
+    в списке покупок пользователя и обновляется при изменении
+    списка покупок или состава рецептов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(verbose_name='Количество', default=0)
+
+    class Meta:
+        verbose_name = 'объект "Позиция списка покупок"'
+        verbose_name_plural = 'Позиции списков покупок'
+        default_related_name = 'shopping_list_items'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'),
+        )
+        ordering = ('user', 'ingredient')
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount} у {self.user}'
+
+
+class FeedItem(models.Model):
+    """Класс модели записи ленты подписок.
+
+    Запись добавляется каждому подписчику при создании рецепта автором.
+    Дата и автор рецепта копируются, чтобы страница ленты выбиралась
+    по индексу без соединения с рецептами.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    created_at = models.DateTimeField('Дата добавления рецепта')
+
+    class Meta:
+        verbose_name = 'объект "Запись ленты"'
+        verbose_name_plural = 'Ленты подписок'
+        default_related_name = 'feed_items'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_feed_item'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-created_at', '-recipe'),
+                name='feed_item_user_created_at_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='feed_item_user_author_idx'
+            ),
+        )
+        ordering = ('user', '-created_at', '-recipe')
+
+    def __str__(self):
+        return f'{self.recipe} в ленте у {self.user}'
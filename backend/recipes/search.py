@@ -0,0 +1,169 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from foodgram_backend.db.routers import use_primary
+
+from .constants import INGREDIENT_SIMILARITY_THRESHOLD, INGREDIENTS_VERSION_KEY
+from .models import Ingredient
+from .utils import get_data_version
+
+
+def get_words(string):
+    """Слова строки в нижнем регистре."""
+    return re.findall(r'\w+', string.casefold())
+
+
+def get_trigrams(string):
+    """Триграммы слов строки с дополнением пробелами, как в pg_trgm."""
+    trigrams = set()
+    for word in get_words(string):
+        word = f'  {word} '
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса.
+
+    Хранит отсортированный список названий в нижнем регистре для поиска
+    по префиксу бинарным поиском и триграммный индекс для поиска
+    по подстроке и нечёткого поиска. Перестраивается при смене версии
+    данных ингредиентов.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.data = ([], [], {}, [])
+        self.lock = threading.Lock()
+
+    def build(self, ingredients):
+        """Построение индекса по словарям с полями ингредиента."""
+        ingredients = sorted(
+            ingredients,
+            key=lambda ingredient: (
+                ingredient['name'].casefold(),
+                ingredient['measurement_unit']
+            )
+        )
+        postings = {}
+        sizes = []
+        for position, ingredient in enumerate(ingredients):
+            trigrams = get_trigrams(ingredient['name'])
+            sizes.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(position)
+        self.data = (
+            [ingredient['name'].casefold() for ingredient in ingredients],
+            ingredients,
+            postings,
+            sizes
+        )
+
+    def refresh(self):
+        version = get_data_version(INGREDIENTS_VERSION_KEY)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            with use_primary():
+                self.build(
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    )
+                )
+            self.version = version
+
+    def get_prefix_range(self, keys, prefix):
+        start = bisect_left(keys, prefix)
+        return start, bisect_left(keys, prefix + chr(0x10FFFF), start)
+
+    def search(self, prefix='', limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        self.refresh()
+        keys, ingredients, _, _ = self.data
+        start, end = self.get_prefix_range(keys, prefix.casefold())
+        if limit:
+            end = min(end, start + limit)
+        return ingredients[start:end]
+
+    def search_fuzzy(self, query, limit=None):
+        """Ингредиенты по началу названия, подстроке и сходству триграмм.
+
+        Сначала идут совпадения по началу названия, затем по подстроке,
+        затем по убыванию триграммного сходства не ниже порогового.
+        """
+        self.refresh()
+        keys, ingredients, postings, sizes = self.data
+        query = query.casefold().strip()
+        start, end = self.get_prefix_range(keys, query)
+        positions = list(range(start, end))
+        if limit and len(positions) >= limit:
+            return ingredients[start:start + limit]
+        found = set(positions)
+        inner_trigrams = {
+            word[i:i + 3]
+            for word in get_words(query) for i in range(len(word) - 2)
+        }
+        if inner_trigrams:
+            candidates = sorted(set.intersection(
+                *(set(postings.get(trigram, ())) for trigram in inner_trigrams)
+            ))
+        else:
+            candidates = range(len(keys))
+        for position in candidates:
+            if position not in found and query in keys[position]:
+                positions.append(position)
+                found.add(position)
+                if limit and len(positions) >= limit:
+                    return [ingredients[position] for position in positions]
+        trigrams = get_trigrams(query)
+        shared = Counter(
+            position
+            for trigram in trigrams for position in postings.get(trigram, ())
+            if position not in found
+        )
+        similar = []
+        for position, count in shared.items():
+            similarity = count / (len(trigrams) + sizes[position] - count)
+            if similarity >= INGREDIENT_SIMILARITY_THRESHOLD:
+                similar.append((-similarity, position))
+        positions.extend(position for _, position in sorted(similar))
+        if limit:
+            positions = positions[:limit]
+        return [ingredients[position] for position in positions]
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_ingredients(query, limit=None):
+    """Поиск ингредиентов по началу названия, подстроке и сходству.
+
+    На PostgreSQL выполняется запросом с использованием триграммных
+    GIN-индексов pg_trgm, на остальных СУБД — по индексу в памяти.
+    """
+    if connection.vendor != 'postgresql':
+        return ingredient_index.search_fuzzy(query, limit)
+    query = query.strip()
+    ingredients = Ingredient.objects.filter(
+        Q(name__icontains=query) | Q(name__trigram_similar=query)
+    ).annotate(
+        rank=Case(
+            When(name__istartswith=query, then=Value(0)),
+            When(name__icontains=query, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField()
+        ),
+        similarity=TrigramSimilarity('name', query)
+    ).order_by(
+        'rank', '-similarity', 'name', 'measurement_unit'
+    ).values('id', 'name', 'measurement_unit')
+    if limit:
+        ingredients = ingredients[:limit]
+    return list(ingredients)
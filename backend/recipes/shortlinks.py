@@ -0,0 +1,124 @@
+import threading
+
+from django.db import close_old_connections
+
+from .constants import (RECIPES_VERSION_KEY, SHORT_LINK_MAX_LENGTH,
+                        SHORT_LINK_PREFIX)
+from .models import Recipe
+from .utils import database_sync_to_async, decode_to_integer, get_data_version
+
+
+class RecipeIdSet:
+    """Множество id существующих рецептов в памяти процесса.
+
+    Перезагружается одним запросом при смене версии набора рецептов.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.ids = frozenset()
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return get_data_version(RECIPES_VERSION_KEY) != self.version
+
+    def refresh(self):
+        """Обновление множества; возвращает True, если была загрузка."""
+        version = get_data_version(RECIPES_VERSION_KEY)
+        if version == self.version:
+            return False
+        with self.lock:
+            if version == self.version:
+                return False
+            self.ids = frozenset(
+                Recipe.objects.values_list('id', flat=True).iterator()
+            )
+            self.version = version
+        return True
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self.ids
+
+
+live_recipe_ids = RecipeIdSet()
+
+
+def resolve_short_link(slug):
+    """Id существующего рецепта по короткой ссылке или None."""
+    if not slug or len(slug) > SHORT_LINK_MAX_LENGTH:
+        return None
+    try:
+        recipe_id = decode_to_integer(slug)
+    except ValueError:
+        return None
+    if recipe_id not in live_recipe_ids:
+        return None
+    return recipe_id
+
+
+def get_short_link_location(path):
+    """Адрес редиректа для запроса короткой ссылки или None."""
+    recipe_id = resolve_short_link(path[len(SHORT_LINK_PREFIX):])
+    if recipe_id is None:
+        return None
+    return f'/recipes/{recipe_id}/'
+
+
+def is_short_link_request(path, method):
+    return path.startswith(SHORT_LINK_PREFIX) and method in ('GET', 'HEAD')
+
+
+class ShortLinkApplication:
+    """WSGI-обёртка, обрабатывающая короткие ссылки до Django.
+
+    Редирект отдаётся без middleware, маршрутизации и запросов к базе;
+    остальные запросы передаются приложению Django.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        if not is_short_link_request(
+            environ.get('PATH_INFO', ''), environ.get('REQUEST_METHOD')
+        ):
+            return self.application(environ, start_response)
+        if live_recipe_ids.refresh():
+            close_old_connections()
+        location = get_short_link_location(environ['PATH_INFO'])
+        if location is None:
+            start_response('404 Not Found', [('Content-Length', '0')])
+        else:
+            start_response('302 Found', [
+                ('Location', location), ('Content-Length', '0')
+            ])
+        return [b'']
+
+
+class ShortLinkASGIApplication:
+    """ASGI-обёртка, обрабатывающая короткие ссылки до Django.
+
+    Редирект отдаётся прямо в цикле событий; в пул потоков уходит только
+    перезагрузка множества id после смены версии набора рецептов.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not is_short_link_request(
+            scope['path'], scope['method']
+        ):
+            return await self.application(scope, receive, send)
+        if live_recipe_ids.is_stale():
+            await database_sync_to_async(live_recipe_ids.refresh)()
+        location = get_short_link_location(scope['path'])
+        headers = [(b'content-length', b'0')]
+        if location is not None:
+            headers.append((b'location', location.encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': 404 if location is None else 302,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': b''})
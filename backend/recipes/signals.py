@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .constants import (INGREDIENTS_VERSION_KEY, RECIPES_VERSION_KEY,
+                        TAGS_VERSION_KEY)
+from .feeds import apply_subscription_change, fan_out_muted, fan_out_recipe
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .utils import (apply_user_recipes_change, bump_data_version,
+                    change_counters, invalidate_recipes)
+from users.models import Subscription
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar'
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_user_recipe(sender, instance, created, **kwargs):
+    """Учёт рецепта, добавленного в избранное или список покупок."""
+    if created:
+        apply_user_recipes_change(
+            sender, instance.user_id, [instance.recipe_id], 1
+        )
+
+
+@receiver(pre_delete, sender=Favorite)
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_user_recipe(sender, instance, **kwargs):
+    """Учёт рецепта, удалённого из избранного или списка покупок.
+
+    Обрабатывается до удаления, чтобы при каскадном удалении рецепта
+    его состав был ещё доступен.
+    """
+    apply_user_recipes_change(
+        sender, instance.user_id, [instance.recipe_id], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def change_recipes_count(sender, instance, signal, created=False, **kwargs):
+    """Изменение счётчика рецептов автора."""
+    if signal is post_save and not created:
+        return
+    change_counters(
+        User, 'recipes_count', {instance.author_id: 1 if created else -1}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def change_ingredients_version(sender, **kwargs):
+    """Смена версии справочника ингредиентов."""
+    bump_data_version(INGREDIENTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def change_tags_version(sender, **kwargs):
+    """Смена версии справочника тегов."""
+    bump_data_version(TAGS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    """Сброс кэша представления изменённого рецепта."""
+    invalidate_recipes([instance.id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def change_recipes_version(sender, created=True, **kwargs):
+    """Смена версии набора рецептов после добавления или удаления."""
+    if created:
+        transaction.on_commit(lambda: bump_data_version(RECIPES_VERSION_KEY))
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    """Рассылка нового рецепта по лентам подписчиков."""
+    if created and not fan_out_muted.get():
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def add_subscription(sender, instance, created, **kwargs):
+    """Учёт новой подписки: счётчик подписчиков и лента подписчика."""
+    if created:
+        apply_subscription_change(instance.user_id, instance.blogger_id, 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_subscription(sender, instance, **kwargs):
+    """Учёт удалённой подписки: счётчик подписчиков и лента подписчика."""
+    apply_subscription_change(instance.user_id, instance.blogger_id, -1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredient(sender, instance, **kwargs):
+    """Сброс кэша представления рецепта при изменении его состава."""
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Сброс кэша представлений рецептов при изменении их тегов."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.id])
+    elif pk_set is not None:
+        invalidate_recipes(pk_set)
+    else:
+        invalidate_recipes(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Tag)
+def invalidate_tag_recipes(sender, instance, **kwargs):
+    """Сброс кэша представлений рецептов с изменённым тегом."""
+    invalidate_recipes(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Ingredient)
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_recipes(sender, instance, **kwargs):
+    """Сброс кэша представлений рецептов с изменённым ингредиентом."""
+    invalidate_recipes(
+        instance.recipe_ingredients.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, update_fields,
+                              **kwargs):
+    """Сброс кэша представлений рецептов при изменении профиля автора."""
+    if created or update_fields and AUTHOR_FIELDS.isdisjoint(update_fields):
+        return
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
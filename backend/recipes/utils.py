@@ -1,12 +1,436 @@
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from foodgram_backend.db.routers import use_primary
+
+from .constants import (LOCAL_CACHE_BACKENDS, RECIPE_CACHE_KEY,
+                        RECIPE_VERSION_KEY, STATE_CACHE, TAGS_VERSION_KEY)
+from .models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem, Tag)
+
+# Счётчики рецепта, которые меняются при добавлении в избранное
+# и список покупок.
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@lru_cache
+def get_char_values(base):
+    """Таблица {символ: значение} для алфавита base."""
+    return {char: value for value, char in enumerate(base)}
 
 
 def decode_to_integer(string, base=settings.SHORT_URL_BASE):
     """Декодирование закодированной строки в положительное число."""
+    values = get_char_values(base)
+    length = len(base)
     integer = 0
-    idx = 0
     for char in string:
-        power = (len(string) - (idx + 1))
-        integer += base.index(char) * (len(base) ** power)
-        idx += 1
+        if char not in values:
+            raise ValueError(f'Недопустимый символ {char!r}.')
+        integer = integer * length + values[char]
     return integer
+
+
+def database_sync_to_async(func):
+    """Выполнение синхронной функции в пуле потоков из асинхронного кода.
+
+    Соединения с базой закрываются по тем же правилам, что и в конце
+    обычного запроса, поэтому потоки пула не удерживают их.
+    """
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+def is_cache_local(alias=STATE_CACHE):
+    """Кэш alias не разделяется между процессами."""
+    return settings.CACHES[alias]['BACKEND'] in LOCAL_CACHE_BACKENDS
+
+
+def get_data_version(key):
+    """Текущая версия справочных данных из кэша состояния.
+
+    Версией служит счётчик изменений. Новый счётчик начинается со
+    времени в наносекундах, чтобы после потери кэша версии
+    не повторяли выданные ранее.
+    """
+    state = caches[STATE_CACHE]
+    version = state.get(key)
+    if version is None:
+        state.add(key, time.time_ns(), None)
+        version = state.get(key)
+    return version
+
+
+def bump_data_version(key):
+    """Смена версии справочных данных после их изменения."""
+    state = caches[STATE_CACHE]
+    try:
+        state.incr(key)
+    except ValueError:
+        if not state.add(key, time.time_ns(), None):
+            state.incr(key)
+
+
+tag_ids_cache = {}
+
+
+def get_tag_ids():
+    """Словарь {слаг: id} тегов из памяти процесса.
+
+    Перестраивается при смене версии данных тегов.
+    """
+    version = get_data_version(TAGS_VERSION_KEY)
+    if tag_ids_cache.get('version') != version:
+        with use_primary():
+            tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        tag_ids_cache.update(tag_ids=tag_ids, version=version)
+    return tag_ids_cache['tag_ids']
+
+
+def get_recipe_cache_keys(recipe_ids):
+    """Словарь {id рецепта: ключ кэша его представления}.
+
+    Ключ содержит версию рецепта из кэша состояния. Версия меняется
+    при каждом сбросе, поэтому представление, построенное по данным
+    до изменения, после сброса больше не читается.
+    """
+    version_keys = {
+        recipe_id: RECIPE_VERSION_KEY.format(recipe_id)
+        for recipe_id in recipe_ids
+    }
+    versions = caches[STATE_CACHE].get_many(version_keys.values())
+    return {
+        recipe_id: RECIPE_CACHE_KEY.format(recipe_id, versions.get(key, 0))
+        for recipe_id, key in version_keys.items()
+    }
+
+
+def invalidate_recipes(recipe_ids):
+    """Смена версий представлений рецептов после фиксации."""
+    keys = [RECIPE_VERSION_KEY.format(recipe_id) for recipe_id in recipe_ids]
+    if keys:
+        transaction.on_commit(lambda: caches[STATE_CACHE].set_many(
+            dict.fromkeys(keys, uuid4().hex), None
+        ))
+
+
+def change_counters(model, field, deltas):
+    """Изменение счётчика field объектов model одним UPDATE.
+
+    deltas — словарь {id объекта: изменение}. Значения изменяются
+    через F(), поэтому одновременные изменения не теряются.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(set(deltas.values())) == 1:
+        delta = Value(next(iter(deltas.values())))
+    else:
+        delta = Case(
+            *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    model.objects.filter(pk__in=deltas).update(**{field: F(field) + delta})
+
+
+def get_recipe_amounts(recipe_id):
+    """Состав рецепта в виде словаря {id ингредиента: количество}."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def get_recipes_amounts(recipe_ids):
+    """Суммарный состав рецептов {id ингредиента: количество}."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total_amount=Sum('amount')
+        ).values_list('ingredient_id', 'total_amount').order_by()
+    )
+
+
+def change_shopping_lists(user_ids, amounts):
+    """Изменение агрегированных списков покупок пользователей.
+
+    amounts — словарь {id ингредиента: изменение количества}.
+    Недостающие позиции создаются с нулевым количеством, затем все позиции
+    изменяются одним UPDATE, а обнулившиеся удаляются.
+    """
+    user_ids = list(user_ids)
+    amounts = {
+        ingredient_id: amount
+        for ingredient_id, amount in amounts.items() if amount
+    }
+    if not user_ids or not amounts:
+        return
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items() if amount > 0
+            ],
+            ignore_conflicts=True
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=amounts
+        )
+        items.update(amount=F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(amount))
+                for ingredient_id, amount in amounts.items()
+            ),
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+        if any(amount < 0 for amount in amounts.values()):
+            items.filter(amount__lte=0).delete()
+
+
+def update_shopping_lists(recipe_id, old_amounts):
+    """Перенос изменения состава рецепта в списки покупок."""
+    new_amounts = get_recipe_amounts(recipe_id)
+    change_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in new_amounts.keys() | old_amounts.keys()
+        }
+    )
+
+
+@contextmanager
+def track_recipe_ingredients(*recipe_ids):
+    """Контекст изменения состава рецептов.
+
+    По выходу из контекста списки покупок пользователей, добавивших эти
+    рецепты, обновляются на разницу в составе.
+    """
+    recipe_ids = {recipe_id for recipe_id in recipe_ids if recipe_id}
+    old_amounts = {
+        recipe_id: get_recipe_amounts(recipe_id) for recipe_id in recipe_ids
+    }
+    yield
+    for recipe_id in recipe_ids:
+        update_shopping_lists(recipe_id, old_amounts[recipe_id])
+
+
+def can_return_rows(connection):
+    """Поддерживает ли СУБД RETURNING в INSERT и DELETE."""
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def apply_user_recipes_change(model, user_id, recipe_ids, delta):
+    """Счётчики рецептов и список покупок после изменения записей.
+
+    delta равна 1 после добавления рецептов recipe_ids в избранное или
+    список покупок и -1 после удаления. Вызывается и обработчиками
+    сигналов, и операциями, которые пишут в базу без сигналов.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    change_counters(
+        Recipe, RECIPE_COUNTERS[model], dict.fromkeys(recipe_ids, delta)
+    )
+    if model is ShoppingCart:
+        amounts = (
+            get_recipe_amounts(recipe_ids[0]) if len(recipe_ids) == 1
+            else get_recipes_amounts(recipe_ids)
+        )
+        change_shopping_lists([user_id], {
+            ingredient_id: delta * amount
+            for ingredient_id, amount in amounts.items()
+        })
+
+
+def add_user_recipes(model, user, recipe_ids):
+    """Пакетное добавление рецептов в избранное или список покупок.
+
+    Добавленные рецепты определяются самой вставкой (RETURNING), поэтому
+    одновременные запросы не учитывают один рецепт дважды. Сигналы
+    не отправляются, список покупок и счётчики рецептов изменяются
+    здесь же. Возвращает множество id добавленных рецептов.
+    """
+    with transaction.atomic():
+        if can_return_rows(connections[router.db_for_write(model)]):
+            added = insert_returning_related_ids(
+                model, 'recipe', recipe_ids, user=user.id
+            )
+        else:
+            added = set(recipe_ids) - set(
+                model.objects.filter(
+                    user=user, recipe_id__in=recipe_ids
+                ).values_list('recipe_id', flat=True)
+            )
+            model.objects.bulk_create(
+                [
+                    model(user=user, recipe_id=recipe_id)
+                    for recipe_id in added
+                ],
+                ignore_conflicts=True
+            )
+        apply_user_recipes_change(model, user.id, added, 1)
+    return added
+
+
+def remove_user_recipes(model, user, recipe_ids):
+    """Пакетное удаление рецептов из избранного или списка покупок.
+
+    Удалённые рецепты определяются самим удалением (RETURNING). Без
+    RETURNING записи удаляются через ORM, и изменения вносят
+    обработчики сигналов. Возвращает множество id удалённых рецептов.
+    """
+    with transaction.atomic():
+        if not can_return_rows(connections[router.db_for_write(model)]):
+            items = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+            removed = set(items.values_list('recipe_id', flat=True))
+            items.delete()
+            return removed
+        removed = delete_returning_related_ids(
+            model, 'recipe', recipe_ids, user=user.id
+        )
+        apply_user_recipes_change(model, user.id, removed, -1)
+    return removed
+
+
+def get_insert_select_sql(connection, model, related_field, names, count):
+    """INSERT ... SELECT строк model для count объектов related_field.
+
+    Строки со значениями полей names добавляются только для
+    существующих объектов и без конфликтов (ON CONFLICT DO NOTHING или
+    INSERT OR IGNORE в зависимости от СУБД). Параметры запроса:
+    значения полей names, затем id объектов.
+    """
+    quote = connection.ops.quote_name
+    field = model._meta.get_field(related_field)
+    related = field.related_model._meta
+    columns = [
+        model._meta.get_field(name).column for name in names
+    ] + [field.column]
+    return (
+        '{insert} {table} ({columns}) SELECT {placeholders}{pk} FROM '
+        '{related_table} WHERE {pk} IN ({ids}) {suffix}'
+    ).format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(column) for column in columns),
+        placeholders='%s, ' * len(names),
+        pk=quote(related.pk.column),
+        related_table=quote(related.db_table),
+        ids=', '.join(['%s'] * count),
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        ),
+    )
+
+
+def insert_ignoring_conflicts(model, related_field, related_id, **values):
+    """Добавление строки одним INSERT ... SELECT без конфликтов.
+
+    Строка model со значениями values и ссылкой related_field на объект
+    related_id добавляется, только если объект существует и такой строки
+    ещё нет. Возвращает True, если строка добавлена.
+    """
+    connection = connections[router.db_for_write(model)]
+    sql = get_insert_select_sql(connection, model, related_field, values, 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*values.values(), related_id])
+        return cursor.rowcount > 0
+
+
+def insert_returning_related_ids(model, related_field, related_ids, **values):
+    """Пакетный INSERT ... SELECT без конфликтов с RETURNING.
+
+    Возвращает множество id объектов related_field, для которых строки
+    действительно добавлены.
+    """
+    related_ids = list(related_ids)
+    if not related_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    sql = get_insert_select_sql(
+        connection, model, related_field, values, len(related_ids)
+    ) + ' RETURNING {}'.format(connection.ops.quote_name(
+        model._meta.get_field(related_field).column
+    ))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*values.values(), *related_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_returning_related_ids(model, related_field, related_ids, **values):
+    """Пакетный DELETE строк model со значениями values с RETURNING.
+
+    Возвращает множество id объектов related_field удалённых строк.
+    Сигналы удаления не отправляются.
+    """
+    related_ids = list(related_ids)
+    if not related_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    column = quote(model._meta.get_field(related_field).column)
+    sql = (
+        'DELETE FROM {table} WHERE {conditions}{column} IN ({ids}) '
+        'RETURNING {column}'
+    ).format(
+        table=quote(model._meta.db_table),
+        conditions=''.join(
+            f'{quote(model._meta.get_field(name).column)} = %s AND '
+            for name in values
+        ),
+        column=column,
+        ids=', '.join(['%s'] * len(related_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*values.values(), *related_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def add_user_recipe(model, user, recipe_id):
+    """Добавление рецепта в избранное или список покупок.
+
+    Возвращает True, если рецепт существует и не был добавлен ранее.
+    """
+    with transaction.atomic():
+        added = insert_ignoring_conflicts(
+            model, 'recipe', recipe_id, user=user.id
+        )
+        if added:
+            apply_user_recipes_change(model, user.id, [recipe_id], 1)
+    return added
+
+
+def remove_user_recipe(model, user, recipe_id):
+    """Удаление рецепта из избранного или списка покупок.
+
+    Возвращает True, если рецепт был добавлен.
+    """
+    return bool(remove_user_recipes(model, user, [recipe_id]))
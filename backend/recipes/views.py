@@ -1,10 +1,13 @@
+from django.http import Http404
 from django.shortcuts import redirect
 
-from .utils import decode_to_integer
+from .shortlinks import live_recipe_ids, resolve_short_link
 
 
 def short_link(request, slug):
     """Редирект по короткой ссылке на страницу рецепта."""
-    return redirect(
-        f'/recipes/{decode_to_integer(slug)}/'
-    )
+    live_recipe_ids.refresh()
+    recipe_id = resolve_short_link(slug)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'/recipes/{recipe_id}/')
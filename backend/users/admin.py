@@ -19,6 +19,9 @@ class UserAdmin(UserAdminBase):
         'email',
         'username',
     )
+    list_display = UserAdminBase.list_display + (
+        'recipes_count', 'subscribers_count'
+    )
 
     def get_readonly_fields(self, request, obj=None):
         if request.user.is_superuser:
@@ -7,7 +7,33 @@ from django.utils.translation import gettext_lazy as _
 from .cosntants import MAX_FIRST_NAME, MAX_LAST_NAME
 
 
-class User(AbstractUser):
+class CountersMixin:
+    """Сохранение объекта без полей COUNTER_FIELDS и VARIANTS_FIELDS.
+
+    Счётчики и списки построенных копий изображений изменяются только
+    запросами UPDATE, а значения в загруженном объекте могут устареть.
+    При сохранении существующего объекта без update_fields записываются
+    все поля, кроме них.
+    """
+    COUNTER_FIELDS = ()
+    VARIANTS_FIELDS = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.name not in self.VARIANTS_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class User(CountersMixin, AbstractUser):
     """Класс модели кастомного пользователя."""
     first_name = models.CharField(_('first name'), max_length=MAX_FIRST_NAME)
     last_name = models.CharField(_('last name'), max_length=MAX_LAST_NAME)
@@ -24,8 +50,25 @@ class User(AbstractUser):
         null=True,
         default=None
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Построенные копии аватара',
+        default=dict,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    COUNTER_FIELDS = ('recipes_count', 'subscribers_count')
+    VARIANTS_FIELDS = ('avatar_variants',)
 
     def __str__(self):
         return self.email